@@ -0,0 +1,78 @@
+"""
+.lang 解析器微基准：在生成的多 MB 语言文件上比较逐行解析 (parse_lang_file) 与整块切分解析 (parse_lang_bytes)。
+
+用法: python .github/scripts/bench_lang_parser.py [--size-mb 8] [--repeat 5]
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+# update_dictionary 在导入时检查这两个变量，基准测试不会访问网络
+os.environ.setdefault("GITHUB_TOKEN", "benchmark")
+os.environ.setdefault("GITHUB_REPOSITORY", "benchmark/benchmark")
+sys.path.insert(0, str(Path(__file__).parent))
+
+from update_dictionary import parse_lang_bytes, parse_lang_file  # noqa: E402
+
+
+def generate_lang_file(size_bytes, seed=0):
+    """生成接近指定大小的 .lang 文件，包含注释、空行、CRLF、多余空白和值中的 '='。"""
+    rng = random.Random(seed)
+    words = ["Iron", "Gold", "Block", "of", "Ingot", "铁锭", "金块", "Tooltip", "=", "§6Rare"]
+    lines = []
+    size = 0
+    index = 0
+    while size < size_bytes:
+        kind = rng.random()
+        if kind < 0.05:
+            line = f"# comment {index}"
+        elif kind < 0.08:
+            line = "   "
+        else:
+            value = " ".join(rng.choice(words) for _ in range(rng.randint(1, 8)))
+            padding = " " * rng.randint(0, 2)
+            line = f"{padding}item.mod.entry_{index}.name{padding}={padding}{value}{padding}"
+        line += "\r\n" if rng.random() < 0.1 else "\n"
+        lines.append(line)
+        size += len(line.encode("utf-8"))
+        index += 1
+    return "".join(lines).encode("utf-8")
+
+
+def parse_lines(content):
+    """旧路径：解码后按行解析。"""
+    return parse_lang_file(io.StringIO(content.decode("utf-8"), newline=None))
+
+
+def best_time(func, content, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(content)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=".lang 解析器微基准")
+    parser.add_argument("--size-mb", type=float, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'大小 (MB)':>10} {'词条数':>10} {'逐行 (ms)':>12} {'整块 (ms)':>12} {'加速比':>8}")
+    for size_mb in args.size_mb:
+        content = generate_lang_file(int(size_mb * 1024 * 1024))
+        line_time, expected = best_time(parse_lines, content, args.repeat)
+        bulk_time, actual = best_time(parse_lang_bytes, content, args.repeat)
+        if list(expected.items()) != list(actual.items()):
+            raise SystemExit("错误：两种解析器的结果不一致。")
+        print(f"{size_mb:>10g} {len(actual):>10} {line_time * 1000:>12.1f} {bulk_time * 1000:>12.1f} "
+              f"{line_time / bulk_time:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
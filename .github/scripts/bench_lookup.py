@@ -0,0 +1,117 @@
+"""
+查询接口基准：比较把 Dict-Mini.json 整个加载为 dict 与通过 dict_lookup.DictLookup 查询 Dict-Sqlite.db 的
+加载耗时、内存占用与单次查询延迟，并核对两者返回的译文列表一致。
+
+未指定 --db 时生成合成数据库，并用更新脚本的导出函数生成对应的 Dict-Mini.json。
+
+用法: python .github/scripts/bench_lookup.py [--rows 200000] [--lookups 20000]
+      python .github/scripts/bench_lookup.py --db Dict-Sqlite.db --mini Dict-Mini.json
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# update_dictionary 在导入时检查这两个变量，基准测试不会访问网络
+os.environ.setdefault("GITHUB_TOKEN", "benchmark")
+os.environ.setdefault("GITHUB_REPOSITORY", "benchmark/benchmark")
+sys.path.insert(0, str(Path(__file__).parent))
+
+from bench_pipeline import generate_base_db  # noqa: E402
+from dict_lookup import DictLookup, rebuild_lookup_indexes  # noqa: E402
+from update_dictionary import iter_mini_entries, write_mini_json  # noqa: E402
+
+
+def prepare_dataset(workdir, rows, seed):
+    """生成合成数据库、全文搜索表与 Dict-Mini.json。"""
+    db_path, mini_path = workdir / "Dict-Sqlite.db", workdir / "Dict-Mini.json"
+    generate_base_db(db_path, rows, seed)
+    conn = sqlite3.connect(db_path)
+    write_mini_json(mini_path, iter_mini_entries(conn.cursor()))
+    rebuild_lookup_indexes(conn)
+    conn.close()
+    return db_path, mini_path
+
+
+def traced(func):
+    """执行 func，返回 (结果, 耗时秒数, 执行后仍占用的 Python 内存 MiB)。"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, current / (1024 * 1024)
+
+
+def per_call_us(func, queries):
+    start = time.perf_counter()
+    for query in queries:
+        func(query)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dict-Mini.json 与 DictLookup 查询基准")
+    parser.add_argument("--db", type=Path, help="已有的 Dict-Sqlite.db（需包含全文搜索表）")
+    parser.add_argument("--mini", type=Path, help="与 --db 对应的 Dict-Mini.json")
+    parser.add_argument("--rows", type=int, default=200000, help="合成数据库的行数")
+    parser.add_argument("--lookups", type=int, default=20000, help="每种查询的次数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="dict-lookup-bench-") as tmpdir:
+        if args.db:
+            db_path, mini_path = args.db, args.mini
+        else:
+            db_path, mini_path = prepare_dataset(Path(tmpdir), args.rows, args.seed)
+
+        mini, json_load_s, json_mib = traced(lambda: json.loads(mini_path.read_text(encoding='utf-8')))
+        lookup, open_s, open_mib = traced(lambda: DictLookup(db_path))
+
+        rng = random.Random(args.seed)
+        origins = list(mini)
+        # 九成查询命中已有原文，一成查询不存在的原文
+        queries = [rng.choice(origins) if rng.random() < 0.9 else f"missing {i}" for i in range(args.lookups)]
+        for query in queries[:1000]:
+            if list(lookup.translations(query)) != mini.get(query, []):
+                raise SystemExit(f"错误：{query!r} 的译文列表与 Dict-Mini.json 不一致。")
+        lookup.translations.cache_clear()
+
+        prefixes = [origin[:rng.randint(1, max(1, min(len(origin), 6)))] for origin in rng.sample(origins, 500)]
+        words = [rng.choice(origin.split() or [origin]) for origin in rng.sample(origins, 500)]
+        words = [word for word in words if len(word) >= 3] or ["Iron"]
+        # 热点查询集合小于缓存容量，第二轮起全部命中缓存
+        hot = queries[:1000]
+        results = [
+            ("dict 查询 (Dict-Mini.json)", per_call_us(mini.get, queries)),
+            ("translations 首次查询", per_call_us(lookup.translations, queries)),
+            ("translations 缓存命中", per_call_us(lookup.translations, hot * 10)),
+            ("exact", per_call_us(lookup.exact, queries)),
+            ("prefix (limit 50)", per_call_us(lookup.prefix, prefixes)),
+            ("ignore_case (limit 50)", per_call_us(lambda q: lookup.ignore_case(q.lower()), queries[:2000])),
+            ("search (FTS5, limit 50)", per_call_us(lookup.search, words)),
+        ]
+        lookup.translations.cache_clear()
+        _, _, cached_mib = traced(lambda: [lookup.translations(query) for query in queries])
+
+        print(f"原文数: {len(mini)}  Dict-Mini.json: {mini_path.stat().st_size / 1024 / 1024:.1f} MiB  "
+              f"Dict-Sqlite.db: {db_path.stat().st_size / 1024 / 1024:.1f} MiB")
+        print(f"{'方式':<24} {'加载 (ms)':>10} {'内存 (MiB)':>12}")
+        print(f"{'json.loads(Dict-Mini)':<24} {json_load_s * 1000:>10.1f} {json_mib:>12.1f}")
+        print(f"{'DictLookup 打开':<24} {open_s * 1000:>10.1f} {open_mib:>12.1f}")
+        print(f"{'DictLookup 填满缓存后':<24} {'':>10} {cached_mib:>12.1f}")
+        print(f"\n{'查询':<28} {'平均延迟 (µs)':>14}")
+        for name, latency in results:
+            print(f"{name:<28} {latency:>14.1f}")
+        lookup.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,468 @@
+"""
+更新流程基准测试：不访问 GitHub，也不下载真实的 CFPA 数据库。
+
+1. 生成指定规模的合成 Dict-Sqlite.db，以及 N 个模组的合成仓库（Zip / Raw / 多分支、json / lang、GitHub / GitLab）；
+2. 启动本地 aiohttp 替身服务器，模拟 GitHub 与 GitLab 的 Release、仓库信息、提交、目录列表、归档与 Raw 接口；
+3. 运行 update_dictionary.main()，分阶段统计耗时、峰值 RSS 与每秒处理行数；
+   多次运行时，第二次起有一个模组推送新提交，并校验增量生成的 Release 文件与完整重建一致，不一致时失败；
+4. 以 JSON 输出结果，便于在不同提交之间比较。
+
+用法: python .github/scripts/bench_pipeline.py [--base-rows 200000] [--mods 20] [--keys 5000] [--output bench.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import importlib
+import io
+import json
+import os
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+from urllib.parse import unquote
+
+from aiohttp import web
+
+SCRIPTS_DIR = Path(__file__).parent
+WORDS = ["Iron", "Gold", "Copper", "Block", "Ingot", "Gear", "Plate", "Machine", "Casing", "Wire", "of", "the"]
+ZH_WORDS = ["铁", "金", "铜", "块", "锭", "齿轮", "板", "机器", "外壳", "导线"]
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存 (MB)；Linux 上 ru_maxrss 的单位是 KB。"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def random_text(rng, words, low=1, high=4):
+    return " ".join(rng.choice(words) for _ in range(rng.randint(low, high)))
+
+
+def generate_base_db(path, rows, seed=0):
+    """生成与上游结构相同的合成基础数据库。"""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("""
+    CREATE TABLE dict(
+        ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        ORIGIN_NAME     TEXT    NOT NULL,
+        TRANS_NAME      TEXT    NOT NULL,
+        MODID           TEXT    NOT NULL,
+        KEY             TEXT    NOT NULL,
+        VERSION         TEXT    NOT NULL,
+        CURSEFORGE      TEXT    NOT NULL
+    );
+    """)
+    conn.execute("CREATE INDEX idx_origin_name ON dict (ORIGIN_NAME);")
+    conn.execute("CREATE INDEX idx_lookup ON dict (MODID, KEY, VERSION, CURSEFORGE);")
+    conn.executemany(
+        "INSERT INTO dict (ORIGIN_NAME, TRANS_NAME, MODID, KEY, VERSION, CURSEFORGE) VALUES (?, ?, ?, ?, ?, ?)",
+        ((random_text(rng, WORDS), random_text(rng, ZH_WORDS), f"basemod{i % 500}", f"item.entry_{i}",
+          rng.choice(["1.12", "1.16", "1.18", "1.20"]), f"basemod-{i % 500}") for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+
+def blob_sha(content):
+    """与 git 相同的 blob SHA：内容相同的文件在各分支中 SHA 相同。"""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+def lang_files(lang_dir, en, zh, legacy):
+    if legacy:
+        return {
+            f"{lang_dir}/en_US.lang": "".join(f"{k}={v}\n" for k, v in en.items()).encode('utf-8'),
+            f"{lang_dir}/zh_CN.lang": "".join(f"{k}={v}\n" for k, v in zh.items()).encode('utf-8'),
+        }
+    return {
+        f"{lang_dir}/en_us.json": json.dumps(en, ensure_ascii=False, indent=2).encode('utf-8'),
+        f"{lang_dir}/zh_cn.json": json.dumps(zh, ensure_ascii=False, indent=2).encode('utf-8'),
+    }
+
+
+class SyntheticMod:
+    """
+    一个合成模组仓库：各分支的文件内容、下载模式与托管平台。
+    单分支模组只有 main 分支；多分支模组有 1.12 / 1.20 / 1.20.1 三个分支，后两者的语言文件完全相同。
+    """
+
+    def __init__(self, index, keys, filler_files, rng):
+        self.index = index
+        self.provider = 'gitlab' if index % 7 == 6 else 'github'
+        self.download_mode = 'raw' if index % 4 == 3 else 'zip'
+        self.multi_branch = index % 8 == 5
+        self.legacy = index % 5 == 4  # 1.12 使用 .lang 格式
+        self.version = "1.12" if self.legacy else "1.20"
+        self.repo = f"bench/mod{index}"
+        self.modid = f"benchmod{index}"
+        # 与基础数据库中的 basemod 部分重叠，使合并阶段同时出现更新与新增
+        if index % 3 == 0:
+            self.modid, self.curseforge = f"basemod{index}", f"basemod-{index}"
+        else:
+            self.curseforge = f"benchmod-{index}"
+        self.lang_dir = f"src/main/resources/assets/{self.modid}/lang"
+        en, zh = {}, {}
+        for i in range(keys):
+            key = f"item.entry_{i}"
+            en[key] = random_text(rng, WORDS)
+            zh[key] = random_text(rng, ZH_WORDS)
+        filler = {f"src/main/java/bench/Filler{i}.java": rng.randbytes(2048) for i in range(filler_files)}
+        if self.multi_branch:
+            legacy_keys = list(en)[:keys // 2]
+            self.files = {
+                "1.12": lang_files(self.lang_dir, {k: en[k] for k in legacy_keys}, {k: zh[k] for k in legacy_keys},
+                                   legacy=True),
+                "1.20": lang_files(self.lang_dir, en, zh, legacy=False),
+            }
+            self.files["1.20.1"] = dict(self.files["1.20"])
+        else:
+            self.files = {'main': lang_files(self.lang_dir, en, zh, self.legacy)}
+        for files in self.files.values():
+            files.update(filler)
+        self._en, self._zh = en, zh
+        self._refresh()
+
+    def _refresh(self):
+        self.shas = {branch: hashlib.sha1(repr((branch, sorted(files.items()))).encode()).hexdigest()
+                     for branch, files in self.files.items()}
+        self.blob_shas = {branch: {path: blob_sha(content) for path, content in files.items()}
+                          for branch, files in self.files.items()}
+        self._zipballs = {}
+
+    def push_commit(self, rng, changes):
+        """模拟单分支模组的一次新提交：改写 changes 个译文并新增一个词条。"""
+        for key in rng.sample(sorted(self._zh), min(changes, len(self._zh))):
+            self._zh[key] = random_text(rng, ZH_WORDS)
+        key = f"item.added_{len(self._en)}"
+        self._en[key], self._zh[key] = random_text(rng, WORDS), random_text(rng, ZH_WORDS)
+        self.files['main'].update(lang_files(self.lang_dir, self._en, self._zh, self.legacy))
+        self._refresh()
+
+    def resolve(self, ref):
+        """分支名或提交 SHA 对应的分支；不存在时返回 None。"""
+        for branch, sha in self.shas.items():
+            if ref in (branch, sha):
+                return branch
+        return None
+
+    def zipball(self, branch):
+        if branch not in self._zipballs:
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+                for path, content in self.files[branch].items():
+                    zf.writestr(f"mod{self.index}-{self.shas[branch][:7]}/{path}", content)
+            self._zipballs[branch] = buffer.getvalue()
+        return self._zipballs[branch]
+
+    def list_dir(self, branch, directory):
+        """目录下的文件 [(路径, blob SHA)]。"""
+        return [(path, sha) for path, sha in self.blob_shas[branch].items() if path.rpartition('/')[0] == directory]
+
+    def config(self, server_url):
+        config = {
+            'repo': self.repo,
+            'lang_paths': [self.lang_dir],
+            'modid': self.modid,
+            'curseforge': self.curseforge,
+        }
+        if self.multi_branch:
+            # 版本由分支名解析
+            config['branches'] = list(self.files)
+        else:
+            config['version'] = self.version
+        if self.download_mode == 'raw':
+            config['download_mode'] = 'raw'
+        if self.provider == 'gitlab':
+            config['repo_provider'] = 'gitlab'
+            config['repo_host'] = server_url
+        return config
+
+
+def create_stand_in_app(db_path, mods, counters):
+    """GitHub / GitLab 接口的本地替身，只实现更新脚本用到的端点。"""
+    mods_by_repo = {mod.repo: mod for mod in mods}
+    routes = web.RouteTableDef()
+
+    def count(name, size=0):
+        counters['requests'][name] = counters['requests'].get(name, 0) + 1
+        counters['bytes_served'] += size
+
+    def lookup(slug, ref):
+        """返回 (模组, 分支)；仓库或分支不存在时返回 404。"""
+        mod = mods_by_repo.get(slug)
+        branch = mod.resolve(ref) if mod is not None else None
+        if branch is None:
+            raise web.HTTPNotFound()
+        return mod, branch
+
+    def file_response(name, content):
+        count(name, len(content))
+        return web.Response(body=content)
+
+    def commit_response(request, sha, body):
+        etag = f'"{sha}"'
+        if request.headers.get('If-None-Match') == etag:
+            count('commit-304')
+            return web.Response(status=304, headers={'ETag': etag})
+        count('commit')
+        return web.Response(body=body, headers={'ETag': etag})
+
+    @routes.get('/repos/CFPATools/i18n-dict/releases/latest')
+    async def latest_release(request):
+        count('release')
+        stat = db_path.stat()
+        return web.json_response({'assets': [{
+            'name': 'Dict-Sqlite.db', 'id': 1, 'size': stat.st_size, 'updated_at': str(int(stat.st_mtime)),
+            'url': str(request.url.with_path('/assets/Dict-Sqlite.db').with_query(None)),
+        }]})
+
+    @routes.get('/assets/Dict-Sqlite.db')
+    async def release_asset(request):
+        count('asset', db_path.stat().st_size)
+        return web.FileResponse(db_path)
+
+    @routes.get('/repos/{owner}/{name}')
+    async def github_repo(request):
+        count('repo-info')
+        return web.json_response({'default_branch': 'main'})
+
+    @routes.get('/repos/{owner}/{name}/commits/{ref}')
+    async def github_commit(request):
+        mod, branch = lookup(f"{request.match_info['owner']}/{request.match_info['name']}", request.match_info['ref'])
+        return commit_response(request, mod.shas[branch], mod.shas[branch].encode())
+
+    @routes.get('/repos/{owner}/{name}/zipball/{ref}')
+    async def github_zipball(request):
+        mod, branch = lookup(f"{request.match_info['owner']}/{request.match_info['name']}", request.match_info['ref'])
+        return file_response('zipball', mod.zipball(branch))
+
+    @routes.get('/repos/{owner}/{name}/contents/{path:.+}')
+    async def github_contents(request):
+        mod, branch = lookup(f"{request.match_info['owner']}/{request.match_info['name']}",
+                             request.query.get('ref', 'main'))
+        items = [{'path': path, 'type': 'file', 'sha': sha}
+                 for path, sha in mod.list_dir(branch, request.match_info['path'].strip('/'))]
+        if not items:
+            raise web.HTTPNotFound()
+        count('list')
+        return web.json_response(items)
+
+    @routes.get('/raw/{owner}/{name}/{ref}/{path:.+}')
+    async def github_raw(request):
+        mod, branch = lookup(f"{request.match_info['owner']}/{request.match_info['name']}", request.match_info['ref'])
+        content = mod.files[branch].get(request.match_info['path'])
+        if content is None:
+            count('raw-404')
+            raise web.HTTPNotFound()
+        return file_response('raw', content)
+
+    @routes.get('/api/v4/projects/{project}')
+    async def gitlab_project(request):
+        count('repo-info')
+        return web.json_response({'default_branch': 'main'})
+
+    @routes.get('/api/v4/projects/{project}/repository/commits/{ref}')
+    async def gitlab_commit(request):
+        mod, branch = lookup(unquote(request.match_info['project']), unquote(request.match_info['ref']))
+        return commit_response(request, mod.shas[branch], json.dumps({'id': mod.shas[branch]}).encode())
+
+    @routes.get('/api/v4/projects/{project}/repository/archive.zip')
+    async def gitlab_archive(request):
+        mod, branch = lookup(unquote(request.match_info['project']), request.query.get('sha', 'main'))
+        return file_response('zipball', mod.zipball(branch))
+
+    @routes.get('/api/v4/projects/{project}/repository/tree')
+    async def gitlab_tree(request):
+        mod, branch = lookup(unquote(request.match_info['project']), request.query.get('ref', 'main'))
+        items = [{'path': path, 'type': 'blob', 'id': sha}
+                 for path, sha in mod.list_dir(branch, request.query.get('path', '').strip('/'))]
+        if not items:
+            raise web.HTTPNotFound()
+        page, per_page = int(request.query.get('page', '1')), int(request.query.get('per_page', '20'))
+        next_page = str(page + 1) if page * per_page < len(items) else ''
+        count('list')
+        return web.json_response(items[(page - 1) * per_page:page * per_page], headers={'X-Next-Page': next_page})
+
+    @routes.get('/api/v4/projects/{project}/repository/files/{path}/raw')
+    async def gitlab_raw(request):
+        mod, branch = lookup(unquote(request.match_info['project']), request.query.get('ref', 'main'))
+        content = mod.files[branch].get(unquote(request.match_info['path']))
+        if content is None:
+            count('raw-404')
+            raise web.HTTPNotFound()
+        return file_response('raw', content)
+
+    app = web.Application()
+    app.add_routes(routes)
+    return app
+
+
+class StageTimer:
+    """包装更新脚本中的函数，累计各阶段的耗时、调用次数与处理行数。"""
+
+    def __init__(self):
+        self.stages = {}
+
+    def _record(self, name, elapsed, rows):
+        stage = self.stages.setdefault(name, {'wall_seconds': 0.0, 'calls': 0, 'rows': 0})
+        stage['wall_seconds'] += elapsed
+        stage['calls'] += 1
+        stage['rows'] += rows
+        stage['peak_rss_mb'] = round(peak_rss_mb(), 1)
+
+    def wrap(self, module, attribute, name, count_rows=lambda result, args: 0):
+        func = getattr(module, attribute)
+        if asyncio.iscoroutinefunction(func):
+            async def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                result = await func(*args, **kwargs)
+                self._record(name, time.perf_counter() - start, count_rows(result, args))
+                return result
+        else:
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                result = func(*args, **kwargs)
+                self._record(name, time.perf_counter() - start, count_rows(result, args))
+                return result
+        setattr(module, attribute, wrapper)
+
+    def report(self):
+        for stage in self.stages.values():
+            stage['wall_seconds'] = round(stage['wall_seconds'], 4)
+            if stage['rows'] and stage['wall_seconds']:
+                stage['rows_per_second'] = round(stage['rows'] / stage['wall_seconds'], 1)
+        return self.stages
+
+
+def count_dict_rows(db_path):
+    with contextlib.closing(sqlite3.connect(db_path)) as conn:
+        return conn.execute("SELECT COUNT(*) FROM dict").fetchone()[0]
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=SCRIPTS_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_benchmark(args, workdir):
+    rng = random.Random(args.seed)
+    base_db = workdir / "upstream" / "Dict-Sqlite.db"
+    base_db.parent.mkdir()
+    start = time.perf_counter()
+    generate_base_db(base_db, args.base_rows, args.seed)
+    mods = [SyntheticMod(i, args.keys, args.filler_files, rng) for i in range(args.mods)]
+    generation_seconds = time.perf_counter() - start
+
+    counters = {'requests': {}, 'bytes_served': 0}
+    runner = web.AppRunner(create_stand_in_app(base_db, mods, counters), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    server_url = f"http://{host}:{port}"
+
+    config_path = workdir / "source_mods.yml"
+    config_path.write_text(json.dumps({'mods': [mod.config(server_url) for mod in mods]}), encoding='utf-8')
+    run_dir = workdir / "run"
+    run_dir.mkdir()
+    os.environ.update({
+        'GITHUB_TOKEN': 'benchmark',
+        'GITHUB_REPOSITORY': 'benchmark/benchmark',
+        'GITHUB_API_URL': server_url,
+        'GITHUB_RAW_URL': f"{server_url}/raw",
+        'SOURCE_MODS_CONFIG': str(config_path),
+        'DICT_CACHE_DIR': str(workdir / "cache"),
+    })
+    # 多次运行时，第二次起的 Release 文件走增量生成；同时完整重建一次比对，不一致时 main() 抛出 RuntimeError
+    if args.runs > 1:
+        os.environ['VERIFY_INCREMENTAL_RELEASE'] = '1'
+    else:
+        os.environ.pop('VERIFY_INCREMENTAL_RELEASE', None)
+    os.environ.pop('GITHUB_OUTPUT', None)
+    sys.path.insert(0, str(SCRIPTS_DIR))
+    update_dictionary = importlib.import_module('update_dictionary')
+
+    timer = StageTimer()
+    timer.wrap(update_dictionary, 'get_latest_release_db', 'get_latest_release_db')
+    timer.wrap(update_dictionary, 'fetch_lang_data', 'fetch_and_parse',
+               lambda result, a: len(result[0]) + len(result[1]))
+    timer.wrap(update_dictionary, 'fetch_branches_lang_data', 'fetch_and_parse',
+               lambda result, a: sum(len(data[0]) + len(data[1]) for data in result.values()
+                                     if not isinstance(data, BaseException)))
+    timer.wrap(update_dictionary, 'apply_batches', 'merge', lambda result, a: sum(len(b.entries) for b in a[1]))
+    timer.wrap(update_dictionary, 'regenerate_release_files', 'regenerate_release_files',
+               lambda result, a: count_dict_rows(update_dictionary.DB_FILENAME))
+    timer.wrap(update_dictionary.DiffWriter, 'write_batch', 'diff_json', lambda result, a: len(a[1].entries))
+
+    runs = []
+    cwd = os.getcwd()
+    os.chdir(run_dir)
+    try:
+        for run_index in range(args.runs):
+            if run_index:
+                # 让增量生成有内容可修补：一个模组推送新提交，其余模组仍命中缓存
+                next(mod for mod in mods if not mod.multi_branch).push_commit(rng, args.keys // 20 + 1)
+            timer.stages = {}
+            counters['requests'], counters['bytes_served'] = {}, 0
+            start = time.perf_counter()
+            await update_dictionary.main()
+            runs.append({
+                'run': run_index + 1,
+                'wall_seconds': round(time.perf_counter() - start, 4),
+                'peak_rss_mb': round(peak_rss_mb(), 1),
+                'stages': timer.report(),
+                'requests': dict(counters['requests']),
+                'bytes_served': counters['bytes_served'],
+                # Release 正文表格中每个失败的仓库占一行
+                'failed_repos': (run_dir / "release_body.md").read_text(encoding='utf-8').count("❌"),
+            })
+    finally:
+        os.chdir(cwd)
+        await runner.cleanup()
+
+    return {
+        'revision': git_revision(),
+        'python': sys.version.split()[0],
+        'parameters': {'base_rows': args.base_rows, 'mods': args.mods, 'keys_per_mod': args.keys,
+                       'filler_files': args.filler_files, 'seed': args.seed},
+        'dataset_generation_seconds': round(generation_seconds, 4),
+        'runs': runs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="update_dictionary.py 流程基准测试")
+    parser.add_argument("--base-rows", type=int, default=200000, help="合成基础数据库的行数")
+    parser.add_argument("--mods", type=int, default=20, help="合成模组仓库的数量")
+    parser.add_argument("--keys", type=int, default=5000, help="每个模组的词条数")
+    parser.add_argument("--filler-files", type=int, default=50, help="每个 Zip 包中与语言文件无关的文件数")
+    parser.add_argument("--runs", type=int, default=2, help="连续运行次数；第二次起可观察缓存效果")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="结果 JSON 的输出路径，默认输出到标准输出")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="dict-bench-") as tmpdir:
+        # 基准测试期间脚本自身的输出会很多，重定向到文件，只保留结果
+        log_path = Path(tmpdir) / "pipeline.log"
+        with open(log_path, 'w', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+            result = asyncio.run(run_benchmark(args, Path(tmpdir)))
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding='utf-8')
+        print(f"基准测试结果已写入 {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
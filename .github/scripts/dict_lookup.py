@@ -0,0 +1,194 @@
+"""
+Dict-Sqlite.db 的只读查询接口，供翻译工具等长期运行的服务直接嵌入使用。
+
+支持按原文精确查询、前缀查询、忽略大小写查询，以及对原文与译文的全文搜索。
+全文搜索使用 FTS5 trigram 分词的外部内容表 dict_fts，由 update_dictionary.py 在生成 Release 时建立。
+
+用法:
+    python dict_lookup.py Dict-Sqlite.db mini "Iron Ingot"
+    python dict_lookup.py Dict-Sqlite.db search "Iron Plate" --limit 20
+
+    from dict_lookup import DictLookup
+    with DictLookup("Dict-Sqlite.db") as lookup:
+        lookup.translations("Iron Ingot")   # 与 Dict-Mini.json 中该原文的译文列表相同
+"""
+import argparse
+import sqlite3
+import sys
+import threading
+from collections import namedtuple
+from functools import lru_cache
+from pathlib import Path
+
+FTS_TABLE = "dict_fts"
+ORIGIN_INDEX = "idx_origin_name"
+NOCASE_INDEX = "idx_origin_name_nocase"
+# trigram 分词只能索引至少 3 个字符的查询，更短的查询退回到 LIKE 扫描
+FTS_MIN_QUERY_LENGTH = 3
+DEFAULT_CACHE_SIZE = 4096
+DEFAULT_LIMIT = 50
+
+DictEntry = namedtuple('DictEntry', ['origin_name', 'trans_name', 'modid', 'key', 'version', 'curseforge'])
+
+ENTRY_COLUMNS = "ORIGIN_NAME, TRANS_NAME, MODID, KEY, VERSION, CURSEFORGE"
+
+
+def create_lookup_schema(conn):
+    """
+    创建原文索引（前缀查询使用）、忽略大小写索引与全文搜索表（空表），已存在时不做任何事。
+    SQLite 不支持 FTS5 时返回 False。
+    """
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {ORIGIN_INDEX} ON dict (ORIGIN_NAME)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {NOCASE_INDEX} ON dict (ORIGIN_NAME COLLATE NOCASE)")
+    try:
+        conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                     f"ORIGIN_NAME, TRANS_NAME, content='dict', content_rowid='ID', tokenize='trigram')")
+    except sqlite3.OperationalError as e:
+        print(f"警告：当前 SQLite 不支持 FTS5 trigram 分词，跳过全文搜索表: {e}")
+        return False
+    return True
+
+
+def rebuild_lookup_indexes(conn):
+    """在 dict 表写入完成后重建全文搜索表。外部内容表不会随 dict 自动更新，因此每次生成都完整重建。"""
+    if create_lookup_schema(conn):
+        conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('rebuild')")
+    conn.commit()
+
+
+def prefix_upper_bound(prefix):
+    """
+    按 BINARY 排序时，所有以 prefix 开头的字符串都小于返回值；不存在这样的上界时返回 None。
+    UTF-8 的字节序与码位顺序一致：末尾的 U+10FFFF 无法递增，去掉后递增前一个字符；跳过代理区。
+    """
+    stripped = prefix.rstrip(chr(sys.maxunicode))
+    if not stripped:
+        return None
+    code_point = ord(stripped[-1]) + 1
+    if 0xD800 <= code_point <= 0xDFFF:
+        code_point = 0xE000
+    return stripped[:-1] + chr(code_point)
+
+
+class DictLookup:
+    """
+    以只读方式打开 Dict-Sqlite.db。查询结果是不可变的元组，精确查询与译文列表带 LRU 缓存；
+    连接可在多个线程间共享，查询由锁串行化。
+    """
+
+    def __init__(self, db_path, cache_size=DEFAULT_CACHE_SIZE):
+        # as_uri() 会转义路径中的 "?"、"#"、"%" 等字符
+        self._conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True,
+                                     check_same_thread=False)
+        self._lock = threading.Lock()
+        self.has_fts = self._query(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (FTS_TABLE,)) != []
+        # 缓存按实例建立，关闭后随实例一同释放
+        self.exact = lru_cache(maxsize=cache_size)(self._exact)
+        self.translations = lru_cache(maxsize=cache_size)(self._translations)
+
+    def _query(self, sql, params):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _entries(self, sql, params):
+        return tuple(DictEntry(*row) for row in self._query(sql, params))
+
+    def _exact(self, origin_name):
+        """原文完全相同的全部词条，按 ID 排序。"""
+        return self._entries(f"SELECT {ENTRY_COLUMNS} FROM dict WHERE ORIGIN_NAME = ? ORDER BY ID",
+                             (origin_name,))
+
+    def _translations(self, origin_name):
+        """原文的译文列表，按出现次数降序、首次出现的 ID 升序，与 Dict-Mini.json 相同。"""
+        if origin_name == '' or len(origin_name) > 50:
+            return ()
+        return tuple(trans_name for trans_name, in self._query(
+            "SELECT TRANS_NAME FROM dict WHERE ORIGIN_NAME = ? AND ORIGIN_NAME != TRANS_NAME "
+            "GROUP BY TRANS_NAME ORDER BY COUNT(*) DESC, MIN(ID)", (origin_name,)))
+
+    def prefix(self, prefix, limit=DEFAULT_LIMIT):
+        """原文以 prefix 开头（区分大小写）的词条，按原文排序；使用原文索引做范围查询。"""
+        if not prefix:
+            raise ValueError("前缀不能为空。")
+        upper_bound = prefix_upper_bound(prefix)
+        if upper_bound is None:
+            # 前缀全由 U+10FFFF 组成时没有上界，只按下界扫描
+            return self._entries(
+                f"SELECT {ENTRY_COLUMNS} FROM dict INDEXED BY {ORIGIN_INDEX} "
+                "WHERE ORIGIN_NAME >= ? ORDER BY ORIGIN_NAME, ID LIMIT ?", (prefix, limit))
+        return self._entries(
+            f"SELECT {ENTRY_COLUMNS} FROM dict INDEXED BY {ORIGIN_INDEX} "
+            "WHERE ORIGIN_NAME >= ? AND ORIGIN_NAME < ? ORDER BY ORIGIN_NAME, ID LIMIT ?",
+            (prefix, upper_bound, limit))
+
+    def ignore_case(self, origin_name, limit=DEFAULT_LIMIT):
+        """忽略 ASCII 大小写后原文相同的词条；使用 idx_origin_name_nocase。"""
+        return self._entries(
+            f"SELECT {ENTRY_COLUMNS} FROM dict WHERE ORIGIN_NAME = ? COLLATE NOCASE ORDER BY ID LIMIT ?",
+            (origin_name, limit))
+
+    def search(self, text, limit=DEFAULT_LIMIT):
+        """
+        原文或译文包含 text（忽略大小写）的词条，按 ID 排序。
+        不按 FTS5 相关度排序：常见词会命中大量行，排序全部结果比按 rowid 顺序取前 limit 条慢数百倍。
+        """
+        if not text:
+            raise ValueError("搜索内容不能为空。")
+        if not self.has_fts or len(text) < FTS_MIN_QUERY_LENGTH:
+            pattern = '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            return self._entries(
+                f"SELECT {ENTRY_COLUMNS} FROM dict WHERE ORIGIN_NAME LIKE ?1 ESCAPE '\\' "
+                "OR TRANS_NAME LIKE ?1 ESCAPE '\\' ORDER BY ID LIMIT ?2", (pattern, limit))
+        # 用双引号包裹为 FTS5 短语，避免查询中的运算符被解析
+        phrase = '"' + text.replace('"', '""') + '"'
+        return self._entries(
+            f"SELECT {', '.join('d.' + c for c in ENTRY_COLUMNS.split(', '))} FROM {FTS_TABLE} "
+            f"JOIN dict d ON d.ID = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH ? ORDER BY {FTS_TABLE}.rowid LIMIT ?",
+            (phrase, limit))
+
+    def cache_info(self):
+        return {'exact': self.exact.cache_info(), 'translations': self.translations.cache_info()}
+
+    def close(self):
+        self.exact.cache_clear()
+        self.translations.cache_clear()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查询 Dict-Sqlite.db")
+    parser.add_argument("db", help="Dict-Sqlite.db 的路径")
+    parser.add_argument("mode", choices=["mini", "exact", "prefix", "nocase", "search"],
+                        help="mini: 译文列表；exact / prefix / nocase: 按原文查询；search: 全文搜索")
+    parser.add_argument("text")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    args = parser.parse_args()
+
+    with DictLookup(args.db) as lookup:
+        if args.mode == "mini":
+            for trans_name in lookup.translations(args.text):
+                print(trans_name)
+            return
+        if args.mode == "exact":
+            entries = lookup.exact(args.text)[:args.limit]
+        elif args.mode == "prefix":
+            entries = lookup.prefix(args.text, args.limit)
+        elif args.mode == "nocase":
+            entries = lookup.ignore_case(args.text, args.limit)
+        else:
+            entries = lookup.search(args.text, args.limit)
+        for entry in entries:
+            print(f"{entry.origin_name}\t{entry.trans_name}\t{entry.modid}:{entry.key}\t"
+                  f"{entry.version}\t{entry.curseforge}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Dict-Mini.bin：与 Dict-Mini.json 内容相同的二进制格式，可用 mmap 直接映射并二分查找，无需解析整个文件。
+多个进程映射同一文件时共享操作系统的页缓存。
+
+文件布局（小端序，各数组按 8 字节对齐）：
+    文件头           HEADER（见下方 HEADER_FORMAT）
+    origin_offsets   uint64[原文数 + 1]   各原文在原文区中的起止字节偏移，原文按 UTF-8 字节序排列
+    trans_ranges     uint64[原文数 × 2]   各原文的译文在 trans_offsets 中的 [起, 止) 下标
+    trans_offsets    uint64[译文数 + 1]   各译文在译文区中的起止字节偏移，同一原文的译文按频次排序
+    原文区           排好序的原文 UTF-8 字节依次拼接
+    译文区           译文 UTF-8 字节依次拼接
+
+用法:
+    python mini_bin.py Dict-Mini.bin "Iron Ingot"              # 查询一个原文
+    python mini_bin.py Dict-Mini.bin --verify Dict-Mini.json   # 与 JSON 逐条核对
+"""
+import argparse
+import json
+import mmap
+import shutil
+import struct
+import sys
+import tempfile
+import time
+from array import array
+
+MAGIC = b'DICTMINI'
+FORMAT_VERSION = 1
+# magic, 版本, 保留, 原文数, 译文数, 以及 origin_offsets / trans_ranges / trans_offsets / 原文区 / 译文区的文件偏移
+HEADER_FORMAT = '<8sIIQQQQQQQ'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+# 译文区在写入过程中先放在临时文件里，超过阈值后才落盘
+TRANS_SPOOL_MAX_SIZE = 64 * 1024 * 1024
+
+
+def uint64_array(values=()):
+    result = array('Q', values)
+    assert result.itemsize == 8
+    return result
+
+
+def write_uint64s(f, values):
+    if sys.byteorder != 'little':
+        values = uint64_array(values)
+        values.byteswap()
+    values.tofile(f)
+
+
+class MiniBinWriter:
+    """
+    按 Dict-Mini.json 的输出顺序逐个接收 (原文, 译文列表)，译文直接写入临时文件，
+    内存中只保留原文与各数组；write() 时按原文排序并写出完整文件。
+    """
+
+    def __init__(self):
+        self._trans_blob = tempfile.SpooledTemporaryFile(max_size=TRANS_SPOOL_MAX_SIZE)
+        self._trans_offsets = uint64_array([0])
+        self._origins = []
+
+    def add(self, origin_name, translations):
+        first = len(self._trans_offsets) - 1
+        for trans_name in translations:
+            encoded = trans_name.encode('utf-8')
+            self._trans_blob.write(encoded)
+            self._trans_offsets.append(self._trans_offsets[-1] + len(encoded))
+        self._origins.append((origin_name.encode('utf-8'), first, len(self._trans_offsets) - 1))
+
+    def __len__(self):
+        return len(self._origins)
+
+    def write(self, path):
+        """写出文件并释放临时数据，返回原文数。"""
+        self._origins.sort()
+        origin_offsets, trans_ranges = uint64_array([0]), uint64_array()
+        for origin, first, end in self._origins:
+            origin_offsets.append(origin_offsets[-1] + len(origin))
+            trans_ranges.extend((first, end))
+
+        origin_count, trans_count = len(self._origins), len(self._trans_offsets) - 1
+        origin_offsets_pos = HEADER_SIZE
+        trans_ranges_pos = origin_offsets_pos + 8 * len(origin_offsets)
+        trans_offsets_pos = trans_ranges_pos + 8 * len(trans_ranges)
+        origin_blob_pos = trans_offsets_pos + 8 * len(self._trans_offsets)
+        trans_blob_pos = origin_blob_pos + origin_offsets[-1]
+
+        with open(path, 'wb') as f:
+            f.write(struct.pack(HEADER_FORMAT, MAGIC, FORMAT_VERSION, 0, origin_count, trans_count,
+                                origin_offsets_pos, trans_ranges_pos, trans_offsets_pos,
+                                origin_blob_pos, trans_blob_pos))
+            for values in (origin_offsets, trans_ranges, self._trans_offsets):
+                write_uint64s(f, values)
+            for origin, _, _ in self._origins:
+                f.write(origin)
+            self._trans_blob.seek(0)
+            shutil.copyfileobj(self._trans_blob, f, 1024 * 1024)
+
+        self._trans_blob.close()
+        self._origins = []
+        return origin_count
+
+
+class MiniBinReader:
+    """
+    以只读方式 mmap Dict-Mini.bin，按原文二分查找译文列表。打开时只读取文件头，
+    偏移数组直接引用映射的内存（大端平台上才复制一份）。
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, _, self._count, trans_count, origin_offsets_pos, trans_ranges_pos,
+         trans_offsets_pos, self._origin_blob, self._trans_blob) = struct.unpack_from(HEADER_FORMAT, self._mm)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{path} 不是受支持的 Dict-Mini.bin 文件。")
+        self._view = memoryview(self._mm)
+        self._origin_offsets = self._uint64s(origin_offsets_pos, self._count + 1)
+        self._trans_ranges = self._uint64s(trans_ranges_pos, self._count * 2)
+        self._trans_offsets = self._uint64s(trans_offsets_pos, trans_count + 1)
+
+    def _uint64s(self, pos, length):
+        view = self._view[pos:pos + 8 * length].cast('Q')
+        if sys.byteorder == 'little':
+            return view
+        values = uint64_array(view)
+        values.byteswap()
+        view.release()
+        return values
+
+    def _origin_bytes(self, index):
+        start = self._origin_blob + self._origin_offsets[index]
+        return self._mm[start:self._origin_blob + self._origin_offsets[index + 1]]
+
+    def _find(self, origin_name):
+        key = origin_name.encode('utf-8')
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._origin_bytes(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count and self._origin_bytes(low) == key:
+            return low
+        return -1
+
+    def _translations(self, index):
+        first, end = self._trans_ranges[2 * index], self._trans_ranges[2 * index + 1]
+        offsets, base = self._trans_offsets, self._trans_blob
+        return [self._mm[base + offsets[i]:base + offsets[i + 1]].decode('utf-8') for i in range(first, end)]
+
+    def get(self, origin_name, default=None):
+        """返回原文的译文列表（按频次排序），与 Dict-Mini.json 中的值相同。"""
+        index = self._find(origin_name)
+        return default if index < 0 else self._translations(index)
+
+    def __getitem__(self, origin_name):
+        index = self._find(origin_name)
+        if index < 0:
+            raise KeyError(origin_name)
+        return self._translations(index)
+
+    def __contains__(self, origin_name):
+        return self._find(origin_name) >= 0
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        """按 UTF-8 字节序遍历全部原文。"""
+        return (self._origin_bytes(i).decode('utf-8') for i in range(self._count))
+
+    def items(self):
+        return ((self._origin_bytes(i).decode('utf-8'), self._translations(i)) for i in range(self._count))
+
+    def close(self):
+        for values in (getattr(self, name, None) for name in ('_origin_offsets', '_trans_ranges', '_trans_offsets')):
+            if isinstance(values, memoryview):
+                values.release()
+        if getattr(self, '_view', None) is not None:
+            self._view.release()
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def verify(bin_path, json_path):
+    """逐条核对二进制文件与 Dict-Mini.json 的内容，返回不一致的原文数。"""
+    start = time.perf_counter()
+    with open(json_path, encoding='utf-8') as f:
+        expected = json.load(f)
+    json_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with MiniBinReader(bin_path) as reader:
+        open_seconds = time.perf_counter() - start
+        mismatches = sum(1 for origin_name, translations in expected.items()
+                         if reader.get(origin_name) != translations)
+        if len(reader) != len(expected):
+            print(f"原文数不一致：二进制文件 {len(reader)} 个，JSON {len(expected)} 个。")
+            mismatches += abs(len(reader) - len(expected))
+        origins = list(reader)
+        if origins != sorted(origins, key=lambda origin: origin.encode('utf-8')):
+            print("二进制文件中的原文未按 UTF-8 字节序排列。")
+            mismatches += 1
+        if reader.get("\x00不存在的原文") is not None:
+            mismatches += 1
+
+    print(f"已核对 {len(expected)} 个原文，不一致 {mismatches} 个。"
+          f"加载 JSON {json_seconds * 1000:.1f} ms，打开二进制文件 {open_seconds * 1000:.3f} ms。")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查询或核对 Dict-Mini.bin")
+    parser.add_argument("bin", help="Dict-Mini.bin 的路径")
+    parser.add_argument("origin", nargs="?", help="要查询的原文")
+    parser.add_argument("--verify", metavar="DICT_MINI_JSON", help="与指定的 Dict-Mini.json 逐条核对")
+    args = parser.parse_args()
+
+    if args.verify:
+        sys.exit(1 if verify(args.bin, args.verify) else 0)
+    if args.origin is None:
+        parser.error("需要提供要查询的原文，或使用 --verify。")
+    with MiniBinReader(args.bin) as reader:
+        translations = reader.get(args.origin)
+        if translations is None:
+            print(f"未找到原文: {args.origin}")
+            sys.exit(1)
+        for trans_name in translations:
+            print(trans_name)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,106 @@
+import argparse
 import asyncio
+import contextlib
+import contextvars
+import filecmp
+import gzip
+import hashlib
+import heapq
+import multiprocessing
 import os
 import re
+import shutil
 import sqlite3
 import sys
 import tempfile
+import time
 import zipfile
-from collections import Counter, defaultdict
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+from collections import namedtuple
+from operator import itemgetter
 from pathlib import Path
+from urllib.parse import quote
 
 import aiohttp
 import ujson as json
-import requests
 import yaml
 
+from dict_lookup import create_lookup_schema, rebuild_lookup_indexes
+from mini_bin import MiniBinWriter
+
+try:
+    import resource
+except ImportError:  # Windows 上没有 resource 模块，峰值内存记为 0
+    resource = None
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖：未安装时不生成 .zst 文件
+    zstandard = None
+
 # --- 配置常量 ---
-CONFIG_FILE = Path(__file__).parent.parent / "config/source_mods.yml"
+CONFIG_FILE = Path(os.getenv("SOURCE_MODS_CONFIG") or Path(__file__).parent.parent / "config/source_mods.yml")
 DB_FILENAME = "Dict-Sqlite.db"
 JSON_FILENAME = "Dict.json"
 MINI_JSON_FILENAME = "Dict-Mini.json"
+MINI_BIN_FILENAME = "Dict-Mini.bin"
+DEDUP_JSON_FILENAME = "Dict-Dedup.json"
 DIFF_JSON_FILENAME = "diff.json"
+DIFF_NDJSON_FILENAME = "diff.ndjson"
 RELEASE_BODY_FILENAME = "release_body.md"
+RUN_METRICS_FILENAME = "run_metrics.json"
+
+# 仓库 Zip 包按块流式写入临时文件，超过阈值后才落盘
+ZIP_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+ZIP_SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
+# HTTP 客户端：全局并发上限、单主机连接池大小与 429/5xx 重试策略
+HTTP_CONCURRENCY = int(os.getenv("HTTP_CONCURRENCY", "16"))
+HTTP_LIMIT_PER_HOST = int(os.getenv("HTTP_LIMIT_PER_HOST", "8"))
+HTTP_MAX_RETRIES = 4
+HTTP_RETRY_BASE_DELAY = 1.0
+HTTP_RETRY_STATUSES = {429, 500, 502, 503, 504}
+DB_DOWNLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+
+# 生成 Release 文件时每批从数据库读取的行数与输出文件缓冲区大小
+EXPORT_BATCH_SIZE = 10000
+EXPORT_BUFFER_SIZE = 1024 * 1024
+
+# 可选的附加 Release 文件，逗号分隔：ndjson (逐行 JSON 的 diff)、gzip / zstd (压缩版本)、dedup (去重版 Dict-Dedup.json)
+RELEASE_EXTRA_FORMATS = {fmt.strip().lower() for fmt in os.getenv("RELEASE_EXTRA_FORMATS", "").split(",")
+                         if fmt.strip()}
+GZIP_LEVEL = 9
+# 生成去重版词典时每个哈希分区最多容纳的行数，分区写入临时文件，超过阈值后才落盘
+DEDUP_PARTITION_ROWS = 500000
+DEDUP_SPOOL_MAX_SIZE = 16 * 1024 * 1024
+ZSTD_LEVEL = 12
+
+# 语言文件解析在独立的进程池（或线程池）中进行，避免阻塞事件循环；进程数默认为 CPU 核心数
+PARSE_EXECUTOR = os.getenv("PARSE_EXECUTOR", "process")
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "0")) or None
+
+# 同时处理的模组数上限；模组按上次运行的耗时从大到小启动
+MOD_CONCURRENCY = int(os.getenv("MOD_CONCURRENCY", "8"))
+# 分片运行 (--shard) 输出的部分结果，由 --merge-shards 合并
+SHARD_FILENAME = "Dict-Shard-{index}-of-{count}.db"
+
+# 跨运行持久化的缓存目录（在 Actions 中由 actions/cache 保存与恢复）
+CACHE_DIR = Path(os.getenv("DICT_CACHE_DIR", ".cache"))
+FETCH_CACHE_DIR = CACHE_DIR / "fetch"
+RELEASE_STATE_DIR = CACHE_DIR / "release"
+UPSTREAM_DB_CACHE_DIR = CACHE_DIR / "upstream"
+RUN_METRICS_CACHE_FILE = CACHE_DIR / RUN_METRICS_FILENAME
 
 SOURCE_DB_REPO = "CFPATools/i18n-dict"
 
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 GITHUB_REPO = os.getenv("GITHUB_REPOSITORY")
 GITLAB_TOKEN = os.getenv("GITLAB_TOKEN")
+# Actions 运行器会设置 GITHUB_API_URL；两者都可指向本地替身服务器
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip('/')
+GITHUB_RAW_URL = os.getenv("GITHUB_RAW_URL", "https://raw.githubusercontent.com").rstrip('/')
 
 if not GITHUB_TOKEN or not GITHUB_REPO:
     print("错误：环境变量 GITHUB_TOKEN 和 GITHUB_REPOSITORY 未设置。")
@@ -33,37 +108,585 @@ if not GITHUB_TOKEN or not GITHUB_REPO:
 
 HEADERS = {"Authorization": f"token {GITHUB_TOKEN}"}
 
+# --- 运行统计 ---
+
+# 当前协程正在处理的模组（"仓库@分支"），用于把各阶段的统计归到对应模组下
+current_repo = contextvars.ContextVar('current_repo', default=None)
+# 当前协程正在处理的模组在配置文件中的位置，分片运行据此记录批次
+current_mod_index = contextvars.ContextVar('current_mod_index', default=None)
+
+
+def peak_rss_mb():
+    """
+    主进程启动以来的峰值常驻内存 (MiB)，不含解析池的工作进程。Linux 上 ru_maxrss 的单位是 KiB。
+    这是只增不减的累计值：各阶段并发执行、相互重叠，无法单独计量某一阶段的内存用量。
+    """
+    if resource is None:
+        return 0.0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class RunMetrics:
+    """
+    记录本次运行各阶段与各模组的耗时、下载字节数、解析与写入行数及主进程的累计峰值内存，
+    运行结束后写入 run_metrics.json。模组阶段并发执行，按阶段汇总的耗时是各模组耗时之和。
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.stages = {}
+        self.repos = {}
+        self.export_filters = {}
+        self.fetch_cache = {'hits': 0, 'fetches': 0}
+
+    @contextlib.contextmanager
+    def stage(self, name, repo=None):
+        """统计代码块的耗时；未指定 repo 时归到当前协程正在处理的模组。"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, repo, seconds=time.perf_counter() - start, calls=1)
+
+    def add(self, name, repo=None, **counts):
+        """
+        累加阶段计数 (seconds / calls / bytes / rows / rows_written)，
+        并记录此时主进程的累计峰值内存 (process_peak_rss_mb)，即截至该阶段最近一次结束时的最高值。
+        """
+        repo = repo or current_repo.get()
+        targets = [self.stages.setdefault(name, {})]
+        if repo:
+            targets.append(self.repos.setdefault(repo, {}).setdefault(name, {}))
+        peak = round(peak_rss_mb(), 1)
+        for target in targets:
+            for counter, value in counts.items():
+                target[counter] = target.get(counter, 0) + value
+            target['process_peak_rss_mb'] = max(target.get('process_peak_rss_mb', 0), peak)
+
+    def record_fetch_cache(self, hits, fetches):
+        """记录抓取缓存命中与重新下载的分支数。"""
+        self.fetch_cache['hits'] += hits
+        self.fetch_cache['fetches'] += fetches
+
+    def record_filters(self, filename, entries, removed):
+        """记录一个导出文件的词条数，以及各过滤器移除的词条数与字节数。"""
+        self.export_filters[filename] = {'entries': entries, 'removed': removed}
+
+    def absorb(self, report):
+        """并入另一次运行（例如分片）的统计：计数相加，峰值内存取最大值。"""
+        def merge(target, stats):
+            for counter, value in stats.items():
+                if counter == 'process_peak_rss_mb':
+                    target[counter] = max(target.get(counter, 0), value)
+                else:
+                    target[counter] = target.get(counter, 0) + value
+
+        for name, stats in report.get('stages', {}).items():
+            merge(self.stages.setdefault(name, {}), stats)
+        merge(self.fetch_cache, report.get('fetch_cache', {}))
+        for repo, stages in report.get('repos', {}).items():
+            for name, stats in stages.items():
+                merge(self.repos.setdefault(repo, {}).setdefault(name, {}), stats)
+
+    def report(self, client=None):
+        def rounded(stats):
+            return {counter: round(value, 3) if isinstance(value, float) else value
+                    for counter, value in stats.items()}
+
+        return {
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(self.started_at)),
+            'wall_seconds': round(time.perf_counter() - self._start, 3),
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+            'http': {
+                'requests': client.request_count if client else 0,
+                'retries': client.retry_count if client else 0,
+                'bytes_downloaded': client.bytes_downloaded if client else 0,
+            },
+            'stages': {name: rounded(stats) for name, stats in self.stages.items()},
+            'repos': {repo: {name: rounded(stats) for name, stats in stages.items()}
+                      for repo, stages in self.repos.items()},
+            'export_filters': self.export_filters,
+            'fetch_cache': dict(self.fetch_cache),
+        }
+
+
+metrics = RunMetrics()
+
+# --- 网络层 ---
+
+class HttpClient:
+    """
+    基于 aiohttp.ClientSession 的统一异步 HTTP 客户端。
+    所有 GitHub / GitLab 请求都经过这里：全局信号量限制并发，连接器按主机复用连接，
+    遇到 429/5xx 或连接错误时按 Retry-After 或指数退避重试。
+    """
+
+    def __init__(self, session, concurrency=HTTP_CONCURRENCY):
+        self.session = session
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.request_count = 0
+        self.retry_count = 0
+        self.bytes_downloaded = 0
+
+    @staticmethod
+    def create_session():
+        connector = aiohttp.TCPConnector(limit=HTTP_CONCURRENCY, limit_per_host=HTTP_LIMIT_PER_HOST)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=300)
+        return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    def _retry_delay(self, attempt, response=None):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return HTTP_RETRY_BASE_DELAY * (2 ** attempt)
+
+    @contextlib.asynccontextmanager
+    async def request(self, url, headers=None):
+        """发起 GET 请求，返回尚未读取正文的响应；仅在拿到最终响应前重试。"""
+        for attempt in range(HTTP_MAX_RETRIES + 1):
+            async with self._semaphore:
+                self.request_count += 1
+                try:
+                    response = await self.session.get(url, headers=headers)
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    if attempt == HTTP_MAX_RETRIES:
+                        raise
+                    delay = self._retry_delay(attempt)
+                    print(f"  [HTTP] 请求 {url} 失败 ({e})，{delay:.0f} 秒后重试...")
+                else:
+                    if response.status not in HTTP_RETRY_STATUSES or attempt == HTTP_MAX_RETRIES:
+                        try:
+                            yield response
+                        finally:
+                            response.release()
+                        return
+                    delay = self._retry_delay(attempt, response)
+                    response.release()
+                    print(f"  [HTTP] {url} 返回 {response.status}，{delay:.0f} 秒后重试...")
+            self.retry_count += 1
+            await asyncio.sleep(delay)
+
+    async def get_json(self, url, headers=None):
+        async with self.request(url, headers) as response:
+            response.raise_for_status()
+            body = await response.read()
+            self.bytes_downloaded += len(body)
+            return json.loads(body)
+
+    async def get_bytes(self, url, headers=None):
+        """下载完整正文；资源不存在 (404) 时返回 None。"""
+        async with self.request(url, headers) as response:
+            if response.status == 404:
+                return None
+            response.raise_for_status()
+            body = await response.read()
+            self.bytes_downloaded += len(body)
+            return body
+
+    async def download_to(self, url, fileobj, headers=None, chunk_size=ZIP_DOWNLOAD_CHUNK_SIZE):
+        """将正文按块写入文件对象，返回写入的字节数。"""
+        written = 0
+        async with self.request(url, headers) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(chunk_size):
+                fileobj.write(chunk)
+                written += len(chunk)
+        self.bytes_downloaded += written
+        return written
+
+
+class GitHubRepo:
+    """GitHub 仓库的 API / Raw / 归档地址。"""
+
+    def __init__(self, repo_slug):
+        self.repo_slug = repo_slug
+        self.headers = HEADERS
+
+    def info_url(self):
+        return f"{GITHUB_API_URL}/repos/{self.repo_slug}"
+
+    provider = 'github'
+
+    def archive_url(self, branch):
+        return f"{GITHUB_API_URL}/repos/{self.repo_slug}/zipball/{branch}"
+
+    def commit_request(self, branch):
+        # sha 媒体类型只返回 40 位提交 SHA，并支持 ETag 条件请求
+        return (f"{GITHUB_API_URL}/repos/{self.repo_slug}/commits/{branch}",
+                {**self.headers, 'Accept': 'application/vnd.github.sha'})
+
+    @staticmethod
+    def parse_commit(body):
+        return body.decode('ascii').strip()
+
+    def raw_url(self, branch, path):
+        return f"{GITHUB_RAW_URL}/{self.repo_slug}/{branch}/{path}"
+
+    async def list_files(self, client, ref, dirs):
+        """
+        列出各语言目录下的文件，返回 {路径: blob SHA}。只列出配置的目录（contents API 每个目录一次请求），
+        不递归获取整个仓库的文件树；不存在的目录视为空。
+        """
+        async def list_dir(directory):
+            path = f"/{quote(directory)}" if directory else ''
+            url = f"{GITHUB_API_URL}/repos/{self.repo_slug}/contents{path}?ref={quote(ref, safe='')}"
+            async with client.request(url, self.headers) as response:
+                if response.status == 404:
+                    return {}
+                response.raise_for_status()
+                body = await response.read()
+            client.bytes_downloaded += len(body)
+            items = json.loads(body)
+            # 路径指向文件而非目录时返回单个对象，视为空目录
+            if not isinstance(items, list):
+                return {}
+            return {item['path']: item['sha'] for item in items if item['type'] == 'file'}
+
+        files = {}
+        for listed in await asyncio.gather(*(list_dir(directory) for directory in dirs)):
+            files.update(listed)
+        return files
+
+
+class GitLabRepo:
+    """GitLab 仓库（含自建实例）的 API / Raw / 归档地址。"""
+
+    def __init__(self, repo_slug, host):
+        self.repo_slug = repo_slug
+        self.headers = get_gitlab_headers()
+        self._project_api = f"{host.rstrip('/')}/api/v4/projects/{quote(repo_slug, safe='')}"
+
+    def info_url(self):
+        return self._project_api
+
+    provider = 'gitlab'
+
+    def archive_url(self, branch):
+        return f"{self._project_api}/repository/archive.zip?sha={branch}"
+
+    def commit_request(self, branch):
+        return f"{self._project_api}/repository/commits/{quote(branch, safe='')}", self.headers
+
+    @staticmethod
+    def parse_commit(body):
+        return json.loads(body)['id']
+
+    def raw_url(self, branch, path):
+        # GitLab Raw API: /projects/:id/repository/files/:file_path/raw?ref=:branch
+        return f"{self._project_api}/repository/files/{quote(path, safe='')}/raw?ref={branch}"
+
+    async def list_files(self, client, ref, dirs):
+        """
+        列出各语言目录下的文件，返回 {路径: blob SHA}。GitLab 的递归列表按页返回整个仓库，
+        因此只列出配置的目录（每个目录通常一页），不存在的目录视为空。
+        """
+        async def list_dir(directory):
+            files, page = {}, '1'
+            while page:
+                url = (f"{self._project_api}/repository/tree?ref={quote(ref, safe='')}"
+                       f"&path={quote(directory, safe='')}&per_page=100&page={page}")
+                async with client.request(url, self.headers) as response:
+                    if response.status == 404:
+                        break
+                    response.raise_for_status()
+                    body = await response.read()
+                    page = response.headers.get('X-Next-Page')
+                client.bytes_downloaded += len(body)
+                files.update((item['path'], item['id']) for item in json.loads(body) if item['type'] == 'blob')
+            return files
+
+        files = {}
+        for listed in await asyncio.gather(*(list_dir(directory) for directory in dirs)):
+            files.update(listed)
+        return files
+
+
+def get_repo_api(mod_config):
+    if get_repo_provider(mod_config) == 'gitlab':
+        return GitLabRepo(mod_config['repo'], mod_config.get('repo_host') or 'https://gitlab.com')
+    return GitHubRepo(mod_config['repo'])
+
+
+class FetchCache:
+    """
+    持久化的抓取缓存，键为 (provider, repo, branch, path)。
+    元数据请求保存 ETag / Last-Modified 与响应正文，下次运行以条件请求发出，304 时直接复用；
+    语言文件则按解析出的提交 SHA 保存已解析的键值对，提交未变时可跳过下载与解析。
+    """
+
+    def __init__(self, directory=FETCH_CACHE_DIR):
+        self.directory = Path(directory)
+        self.index_path = self.directory / "index.json"
+        self.hits = 0
+        self.fetches = 0
+        try:
+            self._index = json.loads(self.index_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            self._index = {}
+
+    @staticmethod
+    def key(repo_api, branch, path):
+        return f"{repo_api.provider}|{repo_api.repo_slug}|{branch}|{path}"
+
+    async def conditional_get(self, client, key, url, headers):
+        """带 If-None-Match / If-Modified-Since 发出请求；未修改时返回缓存的正文。"""
+        entry = self._index.get(key)
+        headers = dict(headers)
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        async with client.request(url, headers) as response:
+            if response.status == 304 and entry and 'body' in entry:
+                return entry['body'].encode('utf-8')
+            response.raise_for_status()
+            body = await response.read()
+            client.bytes_downloaded += len(body)
+            self._index[key] = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'body': body.decode('utf-8'),
+            }
+            return body
+
+    def _payload_path(self, key):
+        return self.directory / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.json"
+
+    def load_payload(self, key, commit_sha):
+        entry = self._index.get(key)
+        if not entry or entry.get('sha') != commit_sha:
+            return None
+        try:
+            payload = json.loads(self._payload_path(key).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        return payload['en'], payload['zh']
+
+    def store_payload(self, key, commit_sha, en_data, zh_data):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self._payload_path(key), 'w', encoding='utf-8') as f:
+            json.dump({'en': en_data, 'zh': zh_data}, f, ensure_ascii=False)
+        self._index[key] = {'sha': commit_sha}
+
+    def record(self, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.fetches += 1
+
+    def save(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index_path.write_text(json.dumps(self._index, ensure_ascii=False), encoding='utf-8')
+
+
+async def resolve_head_commit(client, repo_api, branch, fetch_cache):
+    """解析分支当前指向的提交 SHA；分支未移动时服务器返回 304，不消耗下载。"""
+    url, headers = repo_api.commit_request(branch)
+    body = await fetch_cache.conditional_get(client, fetch_cache.key(repo_api, branch, 'HEAD'), url, headers)
+    return repo_api.parse_commit(body)
+
+
+def lang_payload_path(mod_config, en_filename, zh_filename):
+    """语言文件缓存条目的 path 部分：查找路径、文件名和合并模式任一变化都会使缓存失效。"""
+    lang_paths = mod_config.get('lang_paths') or [mod_config.get('lang_path')]
+    merge_flag = 'merge' if mod_config.get('merge_paths', False) else 'first'
+    mode = mod_config.get('download_mode') or 'zip'
+    return f"lang:{mode}:{merge_flag}:{en_filename}:{zh_filename}:{','.join(map(str, lang_paths))}"
+
 # --- 辅助函数 ---
 
-def get_latest_release_db():
-    """从上游仓库 CFPATools/i18n-dict 的最新 Release 下载 Dict-Sqlite.db 文件。"""
-    print(f"正在从上游仓库 {SOURCE_DB_REPO} 获取最新的数据库...")
-    release_url = f"https://api.github.com/repos/{SOURCE_DB_REPO}/releases/latest"
-    
-    response = requests.get(release_url, headers=HEADERS)
-    if response.status_code != 200:
-        print(f"警告：无法从 {SOURCE_DB_REPO} 获取最新 Release。将创建一个新的数据库。")
-        return False
+class UpstreamDbCache:
+    """
+    上游 Dict-Sqlite.db 的本地缓存。原始文件与其 Release 资源的 ID / 更新时间 / 大小 / 摘要一同保存，
+    资源未变化时不再下载；下载中断时保留 .part 文件，之后以 Range 请求从断点续传。
+    原始文件只以只读方式打开，每次运行通过 SQLite 备份 API 复制出工作副本，因此不会被修改。
+    """
 
-    assets = response.json().get("assets", [])
+    def __init__(self, directory=UPSTREAM_DB_CACHE_DIR):
+        self.directory = Path(directory)
+        self.db_path = self.directory / DB_FILENAME
+        self.meta_path = self.directory / "asset.json"
+        self.part_path = self.directory / f"{DB_FILENAME}.part"
+        self.part_meta_path = self.directory / "asset.part.json"
+
+    @staticmethod
+    def asset_identity(db_asset):
+        return {field: db_asset.get(field) for field in ('id', 'updated_at', 'size', 'digest')}
+
+    @staticmethod
+    def _read_json(path):
+        try:
+            return json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+
+    def cached_asset(self):
+        """已缓存的原始文件对应的资源信息；没有缓存或文件大小不符时返回 None。"""
+        meta = self._read_json(self.meta_path)
+        if not meta or not self.db_path.exists() or self.db_path.stat().st_size != meta['asset'].get('size'):
+            return None
+        return meta['asset']
+
+    def is_current(self, db_asset):
+        return self.cached_asset() == self.asset_identity(db_asset)
+
+    def _start_part(self, identity):
+        """准备 .part 文件，返回已下载的字节数与其 sha256 状态。其他资源残留的 .part 文件不能续传，直接丢弃。"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        if self._read_json(self.part_meta_path) != identity:
+            self.part_path.unlink(missing_ok=True)
+            self.part_meta_path.write_text(json.dumps(identity), encoding='utf-8')
+            return 0, digest
+        if not self.part_path.exists():
+            return 0, digest
+        with open(self.part_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(DB_DOWNLOAD_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return self.part_path.stat().st_size, digest
+
+    def _discard_part(self):
+        self.part_path.unlink(missing_ok=True)
+        self.part_meta_path.unlink(missing_ok=True)
+
+    async def download(self, client, db_asset, url, headers):
+        """下载（或续传）资源到缓存并校验大小与 sha256 摘要，返回本次实际下载的字节数。"""
+        identity = self.asset_identity(db_asset)
+        expected_size = identity['size']
+        offset, digest = self._start_part(identity)
+        if offset:
+            print(f"发现未完成的下载，从第 {offset} 字节续传。")
+        written = 0
+        for attempt in range(HTTP_MAX_RETRIES + 1):
+            if expected_size is not None and offset >= expected_size:
+                break
+            request_headers = dict(headers)
+            if offset:
+                request_headers['Range'] = f"bytes={offset}-"
+            try:
+                async with client.request(url, request_headers) as response:
+                    if offset and response.status != 206:
+                        # 服务器不支持续传或范围无效，从头下载
+                        offset, digest = 0, hashlib.sha256()
+                        if response.status == 416:
+                            self.part_path.unlink(missing_ok=True)
+                            continue
+                    response.raise_for_status()
+                    with open(self.part_path, 'ab' if offset else 'wb') as f:
+                        async for chunk in response.content.iter_chunked(DB_DOWNLOAD_CHUNK_SIZE):
+                            f.write(chunk)
+                            digest.update(chunk)
+                            offset += len(chunk)
+                            written += len(chunk)
+                            client.bytes_downloaded += len(chunk)
+                if expected_size is None or offset >= expected_size:
+                    break
+                reason = "连接提前关闭"
+            except (aiohttp.ClientPayloadError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                reason = e
+            if attempt == HTTP_MAX_RETRIES:
+                break
+            client.retry_count += 1
+            delay = HTTP_RETRY_BASE_DELAY * (2 ** attempt)
+            print(f"  [HTTP] {DB_FILENAME} 下载中断 ({reason})，已下载 {offset} 字节，{delay:.0f} 秒后续传...")
+            await asyncio.sleep(delay)
+
+        if expected_size is not None and offset != expected_size:
+            # 保留 .part 文件，下次运行继续续传（工作流失败时也会保存缓存目录）
+            raise IOError(f"{DB_FILENAME} 下载不完整：预期 {expected_size} 字节，实际 {offset} 字节。")
+        # GitHub 的 Release 资源带有 "sha256:<hex>" 形式的摘要，旧资源可能没有
+        expected_digest = identity['digest'] or ''
+        if expected_digest.startswith('sha256:') and digest.hexdigest() != expected_digest[len('sha256:'):]:
+            self._discard_part()
+            raise ValueError(f"{DB_FILENAME} 的 sha256 校验失败：预期 {expected_digest[len('sha256:'):]}，"
+                          f"实际 {digest.hexdigest()}。")
+
+        os.replace(self.part_path, self.db_path)
+        self.meta_path.write_text(json.dumps({'asset': identity, 'sha256': digest.hexdigest()}), encoding='utf-8')
+        self.part_meta_path.unlink(missing_ok=True)
+        return written
+
+
+def connect_for_writer(db_path):
+    """打开供写入阶段使用的连接。连接只由写入阶段使用，但会在线程池中执行，因此关闭同线程检查。"""
+    return sqlite3.connect(db_path, check_same_thread=False)
+
+
+def open_working_copy(pristine_path, db_path=DB_FILENAME):
+    """用 SQLite 备份 API 把只读打开的原始数据库复制为工作副本，返回工作副本的连接。"""
+    Path(db_path).unlink(missing_ok=True)
+    source = sqlite3.connect(f"{Path(pristine_path).resolve().as_uri()}?mode=ro", uri=True)
+    conn = connect_for_writer(db_path)
+    try:
+        source.backup(conn)
+    finally:
+        source.close()
+    return conn
+
+
+async def get_latest_release_db(client, upstream_cache):
+    """
+    确保本地缓存中是上游仓库 CFPATools/i18n-dict 最新 Release 的 Dict-Sqlite.db，返回该 Release 资源的信息。
+    资源未变化时直接复用缓存；无法获取最新 Release 时退回到已缓存的版本（如果有）。
+    """
+    print(f"正在从上游仓库 {SOURCE_DB_REPO} 获取最新的数据库...")
+    release_url = f"{GITHUB_API_URL}/repos/{SOURCE_DB_REPO}/releases/latest"
+
+    async with client.request(release_url, HEADERS) as response:
+        if response.status != 200:
+            cached_asset = upstream_cache.cached_asset()
+            if cached_asset:
+                print(f"警告：无法从 {SOURCE_DB_REPO} 获取最新 Release，使用本地缓存的 {DB_FILENAME} "
+                      f"(更新于 {cached_asset.get('updated_at')})。")
+                return cached_asset
+            print(f"警告：无法从 {SOURCE_DB_REPO} 获取最新 Release。将创建一个新的数据库。")
+            return None
+        body = await response.read()
+        client.bytes_downloaded += len(body)
+        release = json.loads(body)
+
+    assets = release.get("assets", [])
     db_asset = next((asset for asset in assets if asset['name'] == DB_FILENAME), None)
 
     if not db_asset:
         print(f"警告：在 {SOURCE_DB_REPO} 的最新 Release 中未找到 {DB_FILENAME}。将创建一个新的数据库。")
-        return False
+        return None
+
+    if upstream_cache.is_current(db_asset):
+        print(f"上游 {DB_FILENAME} 未变化 (更新于 {db_asset.get('updated_at')})，复用本地缓存，跳过下载。")
+        return db_asset
 
     print(f"正在从 {SOURCE_DB_REPO} 的最新 Release 下载 {DB_FILENAME}...")
     download_url = db_asset['url']
     headers_for_download = HEADERS.copy()
     headers_for_download['Accept'] = 'application/octet-stream'
-    
-    with requests.get(download_url, headers=headers_for_download, stream=True) as r:
-        r.raise_for_status()
-        with open(DB_FILENAME, 'wb') as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                f.write(chunk)
-    print(f"{DB_FILENAME} 下载完成。")
-    return True
+
+    written = await upstream_cache.download(client, db_asset, download_url, headers_for_download)
+    metrics.add('upstream_db', bytes=written)
+    print(f"{DB_FILENAME} 下载完成，大小与摘要校验通过。")
+    return db_asset
+
+
+async def prepare_database(client):
+    """
+    准备基础数据库，与模组下载并行执行。返回 (供写入阶段使用的连接, 基础数据库指纹)；
+    指纹由上游 Release 资源的 ID、更新时间与大小组成，新建的空数据库没有指纹。
+    """
+    upstream_cache = UpstreamDbCache()
+    with metrics.stage('upstream_db'):
+        db_asset = await get_latest_release_db(client, upstream_cache)
+        if db_asset:
+            conn = await asyncio.to_thread(open_working_copy, upstream_cache.db_path)
+    if not db_asset:
+        conn = connect_for_writer(DB_FILENAME)
+        initialize_db(conn)
+        return conn, None
+    return conn, f"{db_asset['id']}:{db_asset.get('updated_at')}:{db_asset.get('size')}"
 
 def get_repo_provider(mod_config):
     return (mod_config.get('repo_provider') or 'github').lower()
@@ -75,23 +698,12 @@ def get_gitlab_headers():
     return {"PRIVATE-TOKEN": GITLAB_TOKEN}
 
 
-def get_repo_default_branch(repo_slug, mod_config):
+async def get_repo_default_branch(client, repo_api, fetch_cache):
     """获取指定仓库的默认分支名。"""
-    provider = get_repo_provider(mod_config)
-    print(f"正在获取仓库 {repo_slug} 的默认分支...")
-
-    if provider == 'gitlab':
-        gitlab_host = (mod_config.get('repo_host') or 'https://gitlab.com').rstrip('/')
-        project_path = requests.utils.quote(repo_slug, safe='')
-        repo_info_url = f"{gitlab_host}/api/v4/projects/{project_path}"
-        response = requests.get(repo_info_url, headers=get_gitlab_headers())
-        response.raise_for_status()
-        return response.json()['default_branch']
-
-    repo_info_url = f"https://api.github.com/repos/{repo_slug}"
-    response = requests.get(repo_info_url, headers=HEADERS)
-    response.raise_for_status()
-    return response.json()['default_branch']
+    print(f"正在获取仓库 {repo_api.repo_slug} 的默认分支...")
+    key = fetch_cache.key(repo_api, '', 'repo-info')
+    repo_info = json.loads(await fetch_cache.conditional_get(client, key, repo_api.info_url(), repo_api.headers))
+    return repo_info['default_branch']
 
 def parse_version_from_branch(branch_name):
     """从分支名中提取游戏版本号，例如 'mc1.20.1/dev' -> '1.20'。"""
@@ -104,19 +716,67 @@ def parse_version_from_branch(branch_name):
     return "unknown"
 
 
-def find_file_case_insensitive(directory, filename):
-    """在目录中不区分大小写地查找文件。"""
-    if not directory.is_dir():
-        return None
-    filename_lower = filename.lower()
-    for item in directory.iterdir():
-        if item.is_file() and item.name.lower() == filename_lower:
-            return item
-    return None
+def lang_file_key(relative_dir, filename):
+    """生成语言文件的查找键：规范化后的目录 + 小写文件名（文件名不区分大小写）。"""
+    return normalize_lang_dir(relative_dir), filename.lower()
+
+
+class ZipLangSource:
+    """仓库 Zip 包的只读视图：只扫描一次中央目录，按需读取语言文件成员，不解压整个仓库。"""
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self._zip = zipfile.ZipFile(fileobj)
+        self._members = {}
+        for info in self._zip.infolist():
+            if info.is_dir():
+                continue
+            # GitHub 与 GitLab 的归档都以 "<仓库名>-<提交>/" 作为唯一的顶层目录
+            _, _, relative_path = info.filename.partition('/')
+            directory, _, filename = relative_path.rpartition('/')
+            self._members.setdefault(lang_file_key(directory, filename), info)
+
+    def read(self, relative_dir, filename):
+        info = self._members.get(lang_file_key(relative_dir, filename))
+        if info is None:
+            return None
+        return self._zip.read(info)
+
+    def close(self):
+        self._zip.close()
+        self._fileobj.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class RawLangSource:
+    """Raw 模式下载到内存中的语言文件集合，接口与 ZipLangSource 一致。"""
+
+    def __init__(self):
+        self._files = {}
+
+    def add(self, relative_dir, filename, content):
+        self._files[lang_file_key(relative_dir, filename)] = content
+
+    def read(self, relative_dir, filename):
+        return self._files.get(lang_file_key(relative_dir, filename))
+
+    def __len__(self):
+        return len(self._files)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._files.clear()
 
 
 def parse_lang_file(f):
-    """解析 .lang 文件流，返回一个字典。忽略注释和空行。"""
+    """逐行解析 .lang 文件流，返回一个字典。忽略注释和空行。parse_lang_bytes 是其整块解析的等价实现。"""
     data = {}
     for line in f:
         line = line.strip()
@@ -127,232 +787,656 @@ def parse_lang_file(f):
             data[key.strip()] = value.strip()
     return data
 
-async def download_raw_files(session, repo_slug, branch, root_path, mod_config, en_file, zh_file):
-    """直接通过 Raw URL 下载指定文件，跳过 Zip 打包。适配 Github 和 Gitlab"""
-    provider = get_repo_provider(mod_config)
-    
-    if provider == 'gitlab':
-        gitlab_host = (mod_config.get('repo_host') or 'https://gitlab.com').rstrip('/')
-        project_path = requests.utils.quote(repo_slug, safe='')
-        # GitLab Raw API: /projects/:id/repository/files/:file_path/raw?ref=:branch
-        base_api = f"{gitlab_host}/api/v4/projects/{project_path}/repository/files"
-        headers = get_gitlab_headers()
-    else:
-        # GitHub Raw
-        base_url = f"https://raw.githubusercontent.com/{repo_slug}/{branch}"
-        headers = HEADERS
 
+def parse_lang_bytes(content):
+    """
+    整块解析 .lang 文件的原始字节，结果与 parse_lang_file 完全一致：
+    一次解码、一次按行切分，再在第一个 '=' 处拆分；没有 '=' 的行（含空行）直接跳过，
+    去掉空白后以 '#' 开头的键说明整行是注释。换行符处理与文本模式打开文件一致。
+    """
+    text = content.decode('utf-8')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    data = {}
+    for key, sep, value in map(str.partition, text.split('\n'), repeat('=')):
+        if sep:
+            key = key.strip()
+            if not key.startswith('#'):
+                data[key] = value.strip()
+    return data
+
+
+def load_json_lang(content):
+    """解析 .json 语言文件的原始字节。"""
+    return json.loads(content.decode('utf-8'))
+
+
+def load_lang_lang(content):
+    """解析 .lang 语言文件的原始字节。"""
+    return parse_lang_bytes(content)
+
+
+def create_parse_executor():
+    """
+    按 PARSE_EXECUTOR 创建解析用的进程池 (process) 或线程池 (thread)。
+    工作进程在首次提交任务时才启动，此时写入阶段与事件循环默认线程池中的线程已在运行；
+    fork 多线程进程可能复制到被其他线程持有的锁，因此改用 forkserver（不支持时用 spawn）启动。
+    """
+    if PARSE_EXECUTOR == 'thread':
+        return ThreadPoolExecutor(max_workers=PARSE_WORKERS)
+    start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context(start_method))
+
+
+async def parse_in_executor(parse_executor, load_func, contents, return_exceptions=False):
+    """
+    在解析池中并行解析多个文件的原始字节，按输入顺序返回结果。
+    return_exceptions 为真时，解析失败的文件在结果中对应其异常，不影响其他文件。
+    """
+    loop = asyncio.get_running_loop()
+    with metrics.stage('parse'):
+        results = await asyncio.gather(*(loop.run_in_executor(parse_executor, load_func, content)
+                                         for content in contents), return_exceptions=return_exceptions)
+    metrics.add('parse', rows=sum(len(data) for data in results if not isinstance(data, BaseException)))
+    return results
+
+# 文件名变体，用于处理旧版本 Minecraft 的大小写问题 (如 en_US.lang)；按优先级排列
+RAW_FILE_VARIATIONS = {
+    'en_us.lang': ['en_us.lang', 'en_US.lang'],
+    'zh_cn.lang': ['zh_cn.lang', 'zh_CN.lang', 'zh_CN.txt'], # 部分旧版本可能是 txt
+}
+
+
+def normalize_lang_dir(relative_dir):
+    """规范化配置中的语言目录：去掉首尾斜杠、空段与 "." 段，仓库根目录为空字符串。"""
+    return '/'.join(part for part in relative_dir.split('/') if part not in ('', '.'))
+
+
+def raw_file_path(relative_dir, filename):
+    """仓库内的文件路径，与文件列表中的路径一致（"." 与空目录段会被去掉）。"""
+    directory = normalize_lang_dir(relative_dir)
+    return f"{directory}/{filename}" if directory else filename
+
+
+def index_listed_files(listed):
+    """按 lang_file_key（规范化目录 + 小写文件名）索引文件列表中的路径，与 Zip 模式一样不区分文件名大小写。"""
+    index = {}
+    for path in listed:
+        directory, _, filename = path.rpartition('/')
+        index.setdefault(lang_file_key(directory, filename), path)
+    return index
+
+
+def find_listed_file(index, relative_dir, filename):
+    """在目录中不区分大小写地查找语言文件，返回实际路径；文件名变体只决定查找的优先顺序。"""
+    for fname in RAW_FILE_VARIATIONS.get(filename, [filename]):
+        path = index.get(lang_file_key(relative_dir, fname))
+        if path is not None:
+            return path
+    return None
+
+
+async def probe_raw_file(client, repo_api, branch, relative_dir, candidates):
+    """按优先级逐个请求候选文件名，返回第一个存在的文件内容。"""
+    for fname in candidates:
+        try:
+            content = await client.get_bytes(repo_api.raw_url(branch, raw_file_path(relative_dir, fname)),
+                                             repo_api.headers)
+        except Exception as e:
+            print(f"  [Raw下载] 异常: {e}")
+            continue
+        if content is not None:
+            return content
+    return None
+
+
+async def download_raw_files(client, repo_api, branch, mod_config, en_file, zh_file):
+    """
+    直接通过 Raw URL 下载指定文件，跳过 Zip 打包。适配 Github 和 Gitlab。
+    先列出各语言目录下的文件，只并发下载确实存在的候选文件；无法列出时，改为并发探测各路径的候选文件名。
+    """
     paths = mod_config.get('lang_paths', [])
-    
-    # 定义文件名变体，用于处理旧版本 Minecraft 的大小写问题 (如 en_US.lang)
-    file_variations = {
-        'en_us.lang': ['en_us.lang', 'en_US.lang'],
-        'zh_cn.lang': ['zh_cn.lang', 'zh_CN.lang', 'zh_CN.txt'], # 部分旧版本可能是 txt
-    }
 
-    downloaded_count = 0
+    try:
+        listed = await repo_api.list_files(client, branch, [normalize_lang_dir(p) for p in paths])
+    except Exception as e:
+        print(f"  [Raw下载] 无法列出仓库文件 ({e})，改为逐个探测。")
+        listed = None
 
+    index = index_listed_files(listed) if listed is not None else None
+    wanted = []
     for relative_dir in paths:
-        target_dir = root_path / relative_dir
-        target_dir.mkdir(parents=True, exist_ok=True)
-        
         for target_file in [en_file, zh_file]:
-            # 如果是 .lang 文件，尝试多种大小写组合；否则只尝试原名
-            candidates = file_variations.get(target_file, [target_file])
-            
-            found = False
-            for fname in candidates:
-                if provider == 'gitlab':
-                    full_path = f"{relative_dir.strip('/')}/{fname}"
-                    enc_path = requests.utils.quote(full_path, safe='')
-                    url = f"{base_api}/{enc_path}/raw?ref={branch}"
-                else:
-                    url = f"{base_url.rstrip('/')}/{relative_dir.strip('/')}/{fname}"
+            if index is not None:
+                path = find_listed_file(index, relative_dir, target_file)
+                if path is None:
+                    continue
+                # 使用仓库中实际的文件名（大小写可能与目标文件名不同）
+                candidates = [path.rpartition('/')[2]]
+            else:
+                # 如果是 .lang 文件，尝试多种大小写组合；否则只尝试原名
+                candidates = RAW_FILE_VARIATIONS.get(target_file, [target_file])
+            wanted.append((relative_dir, target_file, candidates))
 
-                try:
-                    async with session.get(url, headers=headers) as resp:
-                        if resp.status == 200:
-                            content = await resp.read()
-                            # 统一保存为脚本后续期望的小写文件名
-                            (target_dir / target_file).write_bytes(content)
-                            found = True
-                            downloaded_count += 1
-                            break
-                except Exception as e:
-                    print(f"  [Raw下载] 异常: {e}")
-
-            if not found:
-                # 仅在找不到时打印警告
-                pass
-    
-    if downloaded_count == 0:
+    contents = await asyncio.gather(*(probe_raw_file(client, repo_api, branch, relative_dir, candidates)
+                                      for relative_dir, _, candidates in wanted))
+
+    source = RawLangSource()
+    for (relative_dir, target_file, _), content in zip(wanted, contents):
+        if content is not None:
+            metrics.add('download', bytes=len(content))
+            # 统一保存为脚本后续期望的小写文件名
+            source.add(relative_dir, target_file, content)
+
+    if not source:
         raise FileNotFoundError("未能通过 Raw 模式下载任何语言文件。")
+    return source
 
 
-async def download_repo_zip(session, repo_slug, branch, tmp_path, mod_config):
-    provider = get_repo_provider(mod_config)
-    print(f"正在下载仓库 Zip: {repo_slug} (分支: {branch})")
-    zip_path = tmp_path / "repo.zip"
+async def download_repo_zip(client, repo_api, branch):
+    """将仓库 Zip 包按块流式写入临时文件，返回只读取语言文件成员的 ZipLangSource。"""
+    print(f"正在下载仓库 Zip: {repo_api.repo_slug} (分支: {branch})")
+    spool = tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_MAX_SIZE)
+    try:
+        written = await client.download_to(repo_api.archive_url(branch), spool, repo_api.headers)
+        metrics.add('download', bytes=written)
+        spool.seek(0)
+        return await asyncio.to_thread(ZipLangSource, spool)
+    except BaseException:
+        spool.close()
+        raise
+
+async def fetch_lang_data(client, repo_api, ref, mod_config, en_filename, zh_filename, load_func, parse_executor):
+    """下载模组的英文与中文语言文件并在解析池中解析，返回 (en_data, zh_data)。"""
+    with metrics.stage('download'):
+        if mod_config.get('download_mode') == 'raw':
+            print(f"模式：Raw 文件下载 (跳过 ZIP)")
+            lang_source = await download_raw_files(client, repo_api, ref, mod_config, en_filename, zh_filename)
+        else:
+            lang_source = await download_repo_zip(client, repo_api, ref)
+
+    async def read(relative_dir, filename):
+        # Zip 成员在线程中解压，大的语言文件不会阻塞事件循环
+        return await asyncio.to_thread(lang_source.read, relative_dir, filename)
+
+    with lang_source:
+        lang_paths_config = mod_config.get('lang_paths', [])
+        if not lang_paths_config and mod_config.get('lang_path'):
+            lang_paths_config = [mod_config.get('lang_path')]
+        if not lang_paths_config:
+            raise ValueError(f"缺少 'lang_paths' 配置。")
+
+        en_data, zh_data = {}, {}
+        merge_mode = mod_config.get('merge_paths', False)
+
+        if merge_mode:
+            print("模式：合并多个语言文件。")
+            en_contents = [c for p in lang_paths_config if (c := await read(p, en_filename)) is not None]
+            zh_contents = [c for p in lang_paths_config if (c := await read(p, zh_filename)) is not None]
+            parsed = await parse_in_executor(parse_executor, load_func, en_contents + zh_contents)
+            for data in parsed[:len(en_contents)]:
+                en_data.update(data)
+            for data in parsed[len(en_contents):]:
+                zh_data.update(data)
+            if not en_data or not zh_data:
+                raise FileNotFoundError(f"合并模式下，未能找到 {en_filename} 或 {zh_filename} 文件。")
 
-    if provider == 'gitlab':
-        gitlab_host = (mod_config.get('repo_host') or 'https://gitlab.com').rstrip('/')
-        project_path = requests.utils.quote(repo_slug, safe='')
-        zip_url = f"{gitlab_host}/api/v4/projects/{project_path}/repository/archive.zip?sha={branch}"
-        headers = get_gitlab_headers()
-    else:
-        zip_url = f"https://api.github.com/repos/{repo_slug}/zipball/{branch}"
-        headers = HEADERS
-    
-    async with session.get(zip_url, headers=headers) as response:
-        response.raise_for_status()
-        content = await response.read()
-        zip_path.write_bytes(content)
-        
-    return zip_path
+        else:
+            print("模式：按优先级查找单个语言文件。")
+            en_content, zh_content = None, None
+            for p in lang_paths_config:
+                if en_content is None:
+                    en_content = await read(p, en_filename)
+                if zh_content is None:
+                    zh_content = await read(p, zh_filename)
+                if en_content is not None and zh_content is not None: break
+
+            if en_content is None or zh_content is None:
+                raise FileNotFoundError(f"未在指定路径找到 {en_filename} 或 {zh_filename}。")
 
-async def process_repo(session, mod_config, db_cursor, diff_entries):
-    """处理单个模组仓库，提取翻译并更新数据库。"""
+            en_data, zh_data = await parse_in_executor(parse_executor, load_func, [en_content, zh_content])
+
+    return en_data, zh_data
+
+
+def lang_format(version):
+    """按版本选择语言文件格式：1.13+ 使用 json，之前使用 lang。返回 (英文文件名, 中文文件名, 解析函数)。"""
+    major_str, minor_str, *_ = (version + '.0.0').split('.')
+    use_json = int(major_str) > 1 or (int(major_str) == 1 and int(minor_str) >= 13)
+    if use_json:
+        return "en_us.json", "zh_cn.json", load_json_lang
+    return "en_us.lang", "zh_cn.lang", load_lang_lang
+
+
+def build_mod_batch(mod_config, version, en_data, zh_data):
+    """取英文与中文都存在的键组成批次；非字符串的值（例如 JSON 文本组件）被跳过。"""
+    common_keys = en_data.keys() & zh_data.keys()
+    print(f"合并统计: 找到 {len(common_keys)} 个有效对译。")
+
+    entries = []
+    skipped_count = 0 # 初始化计数器
+
+    for key in common_keys:
+        origin_value = en_data[key]
+        trans_value = zh_data[key]
+
+        # 检查原文和译文的值是否都是字符串，如果不是，则跳过
+        if not isinstance(origin_value, str) or not isinstance(trans_value, str):
+            skipped_count += 1
+            continue
+
+        entries.append((key, origin_value, trans_value))
+
+    # 报告跳过的条目数量
+    if skipped_count > 0:
+        print(f"已跳过 {skipped_count} 个非字符串值的词条 (例如 JSON 文本组件)。")
+
+    return ModBatch(mod_config['modid'], version, mod_config['curseforge'], tuple(entries))
+
+
+def mod_label(mod_config):
+    """模组在运行统计中的名称：单分支模式为“仓库@分支”，多分支模式或未指定分支时为仓库名。"""
+    if mod_config.get('branch') and 'branches' not in mod_config:
+        return f"{mod_config['repo']}@{mod_config['branch']}"
+    return mod_config['repo']
+
+
+def repo_summary(repo_slug, branch, result=None, cache_hit=False, error=None):
+    """Release 正文表格中的一行。"""
+    return {'repo': repo_slug, 'branch': branch,
+            'updated': result.updated if result else 0, 'inserted': result.inserted if result else 0,
+            'unchanged': result.unchanged if result else 0, 'removed': result.removed if result else 0,
+            'cache_hit': cache_hit, 'error': error}
+
+
+def write_merge_result(diff_writer, batch, result, label):
+    # diff.json 只记录原文或译文真正发生变化的条目，合并完成后立即写出
+    if result.changed:
+        diff_writer.write_batch(batch._replace(entries=result.changed))
+    print(f"完成 {label}: 更新 {result.updated} / 新增 {result.inserted} / "
+          f"未变 {result.unchanged} / 源中已移除 {result.removed}")
+
+
+async def process_repo(client, mod_config, write_queue, diff_writer, fetch_cache, parse_executor, fetch_slot=None):
+    """
+    处理单个模组仓库：下载并解析翻译，生成不可变的批次交给写入阶段合并到数据库。
+    若分支的最新提交与上次运行相同，直接复用抓取缓存中已解析的词条，跳过下载与解析。
+    提供 fetch_slot 时，下载与解析完成后即释放该名额。
+    """
     repo_slug = mod_config['repo']
+    repo_api = get_repo_api(mod_config)
+    current_repo.set(mod_label(mod_config))
     print(f"\n--- 开始处理模组: {repo_slug} ---")
 
     branch_name_for_summary = "N/A"
-    update_count, insert_count = 0, 0  # 在开头初始化
+    started = time.perf_counter()
+    cache_hit = False
 
     try:
-        branch = mod_config.get('branch') or get_repo_default_branch(repo_slug, mod_config)
+        branch = mod_config.get('branch') or await get_repo_default_branch(client, repo_api, fetch_cache)
         branch_name_for_summary = branch # 保存分支名用于摘要
         version = mod_config.get('version') or parse_version_from_branch(branch)
 
         print(f"\n--- 处理模组: {repo_slug} | 分支: {branch} | 版本: {version} ---")
 
-        major_str, minor_str, *_ = (version + '.0.0').split('.')
-        # 1.13+ 使用 json, 之前使用 lang
-        use_json = int(major_str) > 1 or (int(major_str) == 1 and int(minor_str) >= 13)
+        en_filename, zh_filename, load_func = lang_format(version)
 
-        if use_json:
-            en_filename = "en_us.json"
-            zh_filename = "zh_cn.json"
-            load_func = json.load
+        try:
+            commit_sha = await resolve_head_commit(client, repo_api, branch, fetch_cache)
+        except Exception as e:
+            print(f"警告：无法获取 {repo_slug} 分支 {branch} 的最新提交，本次不使用抓取缓存: {e}")
+            commit_sha = None
+
+        payload_key = fetch_cache.key(repo_api, branch, lang_payload_path(mod_config, en_filename, zh_filename))
+        cached = fetch_cache.load_payload(payload_key, commit_sha) if commit_sha else None
+        if cached is not None:
+            print(f"缓存命中：{repo_slug}@{branch} 仍为提交 {commit_sha[:12]}，跳过下载与解析。")
+            en_data, zh_data = cached
+            cache_hit = True
         else:
-            en_filename = "en_us.lang"
-            zh_filename = "zh_cn.lang"
-            load_func = parse_lang_file
-        
-        with tempfile.TemporaryDirectory() as tmpdir:
-            tmp_path = Path(tmpdir)
-            
-            if mod_config.get('download_mode') == 'raw':
-                print(f"模式：Raw 文件下载 (跳过 ZIP)")
-                await download_raw_files(session, repo_slug, branch, tmp_path, mod_config, en_filename, zh_filename)
-                repo_root_dir = tmp_path # raw模式下，tmp_path 就是根目录
-            else:
-                zip_path = await download_repo_zip(session, repo_slug, branch, tmp_path, mod_config)
-                with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                    zip_ref.extractall(tmp_path)
-                repo_root_dir = next(d for d in tmp_path.iterdir() if d.is_dir())
-            
-            lang_paths_config = mod_config.get('lang_paths', [])
-            if not lang_paths_config and mod_config.get('lang_path'):
-                lang_paths_config = [mod_config.get('lang_path')]
-            if not lang_paths_config:
-                raise ValueError(f"缺少 'lang_paths' 配置。")
-
-            en_data, zh_data = {}, {}
-            merge_mode = mod_config.get('merge_paths', False)
-
-            if merge_mode:
-                print("模式：合并多个语言文件。")
-                for relative_path in lang_paths_config:
-                    lang_dir = repo_root_dir / relative_path
-                    if en_file_path := find_file_case_insensitive(lang_dir, en_filename):
-                        with open(en_file_path, 'r', encoding='utf-8') as f: en_data.update(load_func(f))
-                    if zh_file_path := find_file_case_insensitive(lang_dir, zh_filename):
-                        with open(zh_file_path, 'r', encoding='utf-8') as f: zh_data.update(load_func(f))
-                if not en_data or not zh_data:
-                    raise FileNotFoundError(f"合并模式下，未能找到 {en_filename} 或 {zh_filename} 文件。")
+            # 按提交 SHA 下载可保证语言文件与缓存记录的提交一致
+            en_data, zh_data = await fetch_lang_data(client, repo_api, commit_sha or branch, mod_config,
+                                                     en_filename, zh_filename, load_func, parse_executor)
+            if commit_sha:
+                fetch_cache.store_payload(payload_key, commit_sha, en_data, zh_data)
+        fetch_cache.record(cache_hit)
+        if fetch_slot is not None:
+            fetch_slot.release()
+
+        # 交给唯一的写入阶段合并，写入顺序与网络调度无关
+        batch = build_mod_batch(mod_config, version, en_data, zh_data)
+        # 写入阶段可能仍在等待上游数据库下载；等待期间只保留紧凑的批次，释放解析出的完整字典
+        del en_data, zh_data, cached
+        result = await submit_batch(write_queue, batch)
+        write_merge_result(diff_writer, batch, result, f"{repo_slug}@{branch}")
+        metrics.add('repo', seconds=time.perf_counter() - started, calls=1)
 
-            else:
-                print("模式：按优先级查找单个语言文件。")
-                en_path, zh_path = None, None
-                for p in lang_paths_config:
-                    lang_dir = repo_root_dir / p
-                    if not en_path:
-                        en_path = find_file_case_insensitive(lang_dir, en_filename)
-                    if not zh_path:
-                        zh_path = find_file_case_insensitive(lang_dir, zh_filename)
-                    if en_path and zh_path: break
-
-                if not en_path or not zh_path:
-                     # raw模式如果失败前面会抛出异常，这里再次确认
-                     if not en_data and not zh_data:
-                        raise FileNotFoundError(f"未在指定路径找到 {en_filename} 或 {zh_filename}。")
-
-                if en_path:
-                    with open(en_path, 'r', encoding='utf-8') as f: en_data = load_func(f)
-                if zh_path:
-                    with open(zh_path, 'r', encoding='utf-8') as f: zh_data = load_func(f)
-
-            common_keys = en_data.keys() & zh_data.keys()
-            print(f"合并统计: 找到 {len(common_keys)} 个有效对译。")
-
-            # 1. 一次性查询出所有可能相关的现有条目
-            db_cursor.execute("SELECT key, ID FROM dict WHERE modid=? AND version=? AND curseforge=?",
-                              (mod_config['modid'], version, mod_config['curseforge']))
-            existing_entries_map = {row[0]: row[1] for row in db_cursor.fetchall()}
-
-            # 2. 在内存中分类需要更新和需要插入的数据
-            to_update = []
-            to_insert = []
-            skipped_count = 0 # 初始化计数器
-
-            for key in common_keys:
-                origin_value = en_data[key]
-                trans_value = zh_data[key]
-
-                # 检查原文和译文的值是否都是字符串，如果不是，则跳过
-                if not isinstance(origin_value, str) or not isinstance(trans_value, str):
-                    skipped_count += 1
-                    continue
+    except Exception as e:
+        print(f"处理仓库 {repo_slug} 时发生错误: {e}")
+        import traceback
+        traceback.print_exc()
+        metrics.add('repo', seconds=time.perf_counter() - started, calls=1)
+        return repo_summary(repo_slug, branch_name_for_summary, cache_hit=cache_hit, error=str(e))
 
-                entry_data = {
-                    'origin_name': origin_value,
-                    'trans_name': trans_value,
-                    'modid': mod_config['modid'], 'key': key,
-                    'version': version, 'curseforge': mod_config['curseforge']
-                }
-                diff_entries.append(entry_data)
+    return repo_summary(repo_slug, branch_name_for_summary, result, cache_hit)
 
-                existing_id = existing_entries_map.get(key)
 
-                if existing_id:
-                    # 准备更新数据: (origin, trans, id)
-                    to_update.append((entry_data['origin_name'], entry_data['trans_name'], existing_id))
-                else:
-                    # 准备插入数据
-                    to_insert.append(tuple(entry_data.values()))
-
-            # 报告跳过的条目数量
-            if skipped_count > 0:
-                print(f"已跳过 {skipped_count} 个非字符串值的词条 (例如 JSON 文本组件)。")
-            # 3. 使用 executemany() 进行批量更新和插入
-            if to_update:
-                db_cursor.executemany("UPDATE dict SET ORIGIN_NAME=?, TRANS_NAME=? WHERE ID=?", to_update)
-            if to_insert:
-                db_cursor.executemany(
-                    "INSERT INTO dict (ORIGIN_NAME, TRANS_NAME, MODID, KEY, VERSION, CURSEFORGE) VALUES (?, ?, ?, ?, ?, ?)",
-                    to_insert)
-
-            update_count, insert_count = len(to_update), len(to_insert)
-            print(f"完成: 更新 {update_count} / 新增 {insert_count}")
+# 多分支模式中一个分支的处理计划
+BranchPlan = namedtuple('BranchPlan', ['branch', 'version', 'en_filename', 'zh_filename', 'load_func',
+                                       'commit_sha', 'payload_key'])
+
+
+def select_lang_files(listed, lang_paths, filename, merge_mode):
+    """
+    在文件列表 {路径: blob SHA} 中按 lang_paths 的顺序查找语言文件，返回 [(路径, blob SHA)]。
+    合并模式返回所有目录中的文件，优先级模式只返回第一个。
+    """
+    index = index_listed_files(listed)
+    found = []
+    for relative_dir in lang_paths:
+        path = find_listed_file(index, relative_dir, filename)
+        if path is not None:
+            found.append((path, listed[path]))
+            if not merge_mode:
+                break
+    return found
+
+
+async def fetch_branches_lang_data(client, repo_api, mod_config, plans, parse_executor):
+    """
+    多分支模式：每个分支只列出一次文件，不下载整个仓库；定位语言文件后按 blob SHA 去重，
+    各分支内容相同的文件只下载、解析一次。无法列出文件的分支退回 fetch_lang_data。
+    返回 {分支: (en_data, zh_data) 或该分支的异常}。
+    """
+    lang_paths = mod_config.get('lang_paths') or [mod_config.get('lang_path')]
+    merge_mode = mod_config.get('merge_paths', False)
+    refs = {plan.branch: plan.commit_sha or plan.branch for plan in plans}
+    listings = await asyncio.gather(*(repo_api.list_files(client, refs[plan.branch],
+                                                          [normalize_lang_dir(p) for p in lang_paths])
+                                      for plan in plans), return_exceptions=True)
+
+    results, selections, fallback = {}, {}, []
+    for plan, listed in zip(plans, listings):
+        if isinstance(listed, Exception):
+            print(f"  [多分支] 无法列出分支 {plan.branch} 的文件，改为单独下载。")
+            fallback.append(plan)
+            continue
+        en_files = select_lang_files(listed, lang_paths, plan.en_filename, merge_mode)
+        zh_files = select_lang_files(listed, lang_paths, plan.zh_filename, merge_mode)
+        if not en_files or not zh_files:
+            results[plan.branch] = FileNotFoundError(
+                f"未在指定路径找到 {plan.en_filename} 或 {plan.zh_filename}。")
+            continue
+        selections[plan.branch] = (plan, en_files, zh_files)
+
+    # 每个不同的 blob 只从第一个包含它的分支下载一次
+    blob_sources = {}
+    for plan, en_files, zh_files in selections.values():
+        for path, blob_sha in en_files + zh_files:
+            blob_sources.setdefault(blob_sha, (refs[plan.branch], path))
+    with metrics.stage('download'):
+        contents = await asyncio.gather(*(client.get_bytes(repo_api.raw_url(ref, path), repo_api.headers)
+                                          for ref, path in blob_sources.values()), return_exceptions=True)
+    # 下载失败的 blob 对应其异常，文件不存在时为 None；只影响包含该 blob 的分支
+    blobs = dict(zip(blob_sources, contents))
+    metrics.add('download', bytes=sum(len(content) for content in contents if isinstance(content, bytes)))
+    print(f"  [多分支] {len(selections)} 个分支共需 {sum(len(e) + len(z) for _, e, z in selections.values())} "
+          f"个语言文件，去重后下载 {len(blob_sources)} 个。")
+
+    # 同一 blob 在不同分支可能按不同格式解析，因此按 (blob, 解析函数) 去重
+    parse_jobs = {}
+    for plan, en_files, zh_files in selections.values():
+        for _, blob_sha in en_files + zh_files:
+            if isinstance(blobs[blob_sha], bytes):
+                parse_jobs.setdefault((blob_sha, plan.load_func), blobs[blob_sha])
+    by_func = {}
+    for blob_sha, load_func in parse_jobs:
+        by_func.setdefault(load_func, []).append(blob_sha)
+    parsed_groups = await asyncio.gather(*(parse_in_executor(parse_executor, load_func,
+                                                             [blobs[blob_sha] for blob_sha in blob_shas],
+                                                             return_exceptions=True)
+                                           for load_func, blob_shas in by_func.items()))
+    parsed = {(blob_sha, load_func): data
+              for (load_func, blob_shas), group in zip(by_func.items(), parsed_groups)
+              for blob_sha, data in zip(blob_shas, group)}
+
+    for branch, (plan, en_files, zh_files) in selections.items():
+        # 某个文件下载失败、不存在 (None) 或解析失败时，只有包含它的分支记为失败
+        outcomes = [parsed.get((blob_sha, plan.load_func), blobs[blob_sha]) for _, blob_sha in en_files + zh_files]
+        failed = [outcome for outcome in outcomes if outcome is None or isinstance(outcome, BaseException)]
+        if failed:
+            results[branch] = failed[0] or FileNotFoundError(f"分支 {branch} 的语言文件下载失败。")
+            continue
+        en_data, zh_data = {}, {}
+        for path, blob_sha in en_files:
+            en_data.update(parsed[blob_sha, plan.load_func])
+        for path, blob_sha in zh_files:
+            zh_data.update(parsed[blob_sha, plan.load_func])
+        results[branch] = (en_data, zh_data)
+    del blobs, parse_jobs
+
+    fallback_results = await asyncio.gather(*(
+        fetch_lang_data(client, repo_api, refs[plan.branch], mod_config, plan.en_filename, plan.zh_filename,
+                        plan.load_func, parse_executor) for plan in fallback), return_exceptions=True)
+    results.update(zip((plan.branch for plan in fallback), fallback_results))
+    return results
+
+
+async def process_mod_branches(client, mod_config, write_queue, diff_writer, fetch_cache, parse_executor,
+                               fetch_slot=None):
+    """
+    多分支模式：处理配置了 branches 列表的模组。
+    并发解析所有分支的最新提交，未变化的分支复用抓取缓存；其余分支只下载语言文件，并按 blob 去重。
+    解析出同一版本的多个分支合并为一个批次（列表中靠后的分支优先），所有版本在一个事务中合并。
+    提供 fetch_slot 时，下载与解析完成后即释放该名额。返回每个版本一行摘要。
+    """
+    repo_slug = mod_config['repo']
+    repo_api = get_repo_api(mod_config)
+    current_repo.set(repo_slug)
+    # 去掉重复的分支名，保持配置中的顺序
+    branches = list(dict.fromkeys(mod_config['branches']))
+    print(f"\n--- 开始处理模组: {repo_slug} | 多分支模式: {', '.join(branches)} ---")
+    started = time.perf_counter()
+    summaries = []
+
+    try:
+        heads = await asyncio.gather(*(resolve_head_commit(client, repo_api, branch, fetch_cache)
+                                       for branch in branches), return_exceptions=True)
+        plans = []
+        for branch, commit_sha in zip(branches, heads):
+            if isinstance(commit_sha, Exception):
+                print(f"警告：无法获取 {repo_slug} 分支 {branch} 的最新提交，本次不使用抓取缓存: {commit_sha}")
+                commit_sha = None
+            # 注意：如果 root 配置中强行指定了 version，所有分支都会使用该版本并合并为一个批次
+            version = mod_config.get('version') or parse_version_from_branch(branch)
+            try:
+                en_filename, zh_filename, load_func = lang_format(version)
+            except ValueError as e:
+                # 无法确定语言文件格式的分支单独记为失败，不影响其他分支
+                print(f"处理仓库 {repo_slug} 分支 {branch} 时发生错误: {e}")
+                summaries.append(repo_summary(repo_slug, branch, error=str(e)))
+                continue
+            payload_key = fetch_cache.key(repo_api, branch,
+                                          lang_payload_path(mod_config, en_filename, zh_filename))
+            plans.append(BranchPlan(branch, version, en_filename, zh_filename, load_func, commit_sha, payload_key))
+
+        lang_data, cache_hits = {}, set()
+        for plan in plans:
+            cached = fetch_cache.load_payload(plan.payload_key, plan.commit_sha) if plan.commit_sha else None
+            if cached is not None:
+                print(f"缓存命中：{repo_slug}@{plan.branch} 仍为提交 {plan.commit_sha[:12]}，跳过下载与解析。")
+                lang_data[plan.branch] = cached
+                cache_hits.add(plan.branch)
+        to_fetch = [plan for plan in plans if plan.branch not in cache_hits]
+        if to_fetch:
+            lang_data.update(await fetch_branches_lang_data(client, repo_api, mod_config, to_fetch,
+                                                            parse_executor))
+        for plan in plans:
+            fetch_cache.record(plan.branch in cache_hits)
+        if fetch_slot is not None:
+            fetch_slot.release()
+
+        # 按版本分组；同一版本中靠后的分支覆盖靠前分支的同名键
+        groups = {}
+        for plan in plans:
+            data = lang_data.pop(plan.branch)
+            if isinstance(data, BaseException):
+                print(f"处理仓库 {repo_slug} 分支 {plan.branch} 时发生错误: {data}")
+                summaries.append(repo_summary(repo_slug, plan.branch, error=str(data)))
+                continue
+            if plan.commit_sha and plan.branch not in cache_hits:
+                fetch_cache.store_payload(plan.payload_key, plan.commit_sha, *data)
+            print(f"--- 分支: {plan.branch} | 版本: {plan.version} ---")
+            batch = build_mod_batch(mod_config, plan.version, *data)
+            group_branches, entries = groups.setdefault(plan.version, ([], {}))
+            group_branches.append(plan.branch)
+            entries.update((entry[0], entry) for entry in batch.entries)
+        del lang_data
+
+        batches = [ModBatch(mod_config['modid'], version, mod_config['curseforge'], tuple(entries.values()))
+                   for version, (_, entries) in groups.items()]
+        groups = [group_branches for group_branches, _ in groups.values()]
+        results = await submit_batches(write_queue, batches) if batches else []
+        for batch, group_branches, result in zip(batches, groups, results):
+            label = ', '.join(group_branches)
+            write_merge_result(diff_writer, batch, result, f"{repo_slug}@{label}")
+            summaries.append(repo_summary(repo_slug, label, result,
+                                          cache_hit=all(branch in cache_hits for branch in group_branches)))
 
     except Exception as e:
         print(f"处理仓库 {repo_slug} 时发生错误: {e}")
         import traceback
         traceback.print_exc()
-        return {'repo': repo_slug, 'branch': branch_name_for_summary, 'updated': 0, 'inserted': 0, 'error': str(e)}
+        summaries = [repo_summary(repo_slug, branch, error=str(e)) for branch in branches]
+
+    metrics.add('repo', seconds=time.perf_counter() - started, calls=1)
+    return summaries
+
+
+# --- 任务规划与分片 ---
+
+# 一个待处理的模组：index 为其在配置文件中的位置，各分片与合并阶段据此保持确定的顺序；
+# cost 为根据上次运行统计估计的耗时（秒）
+ModPlan = namedtuple('ModPlan', ['index', 'config', 'label', 'cost'])
+
+REQUIRED_MOD_KEYS = ('repo', 'modid', 'curseforge')
+
+
+def validate_mod_config(mod_config):
+    """检查一条模组配置，返回错误说明；配置有效时返回 None。"""
+    if not isinstance(mod_config, dict):
+        return "配置项不是映射。"
+    missing = [key for key in REQUIRED_MOD_KEYS if not mod_config.get(key)]
+    if missing:
+        return f"缺少必填配置: {', '.join(missing)}。"
+    if not (mod_config.get('lang_paths') or mod_config.get('lang_path')):
+        return "缺少 'lang_paths' 配置。"
+    if 'branches' in mod_config and not (isinstance(mod_config['branches'], list) and mod_config['branches']):
+        return "'branches' 必须是非空列表。"
+    return None
+
+
+def load_cost_estimates(path=RUN_METRICS_CACHE_FILE):
+    """从上次运行的 run_metrics.json 读取各模组的耗时 {模组名称: 秒}；没有记录时返回空字典。"""
+    try:
+        report = json.loads(Path(path).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+    return {label: stages['repo']['seconds'] for label, stages in report.get('repos', {}).items()
+            if 'seconds' in stages.get('repo', {})}
+
+
+def plan_mods(mod_configs, costs):
+    """
+    校验并去重模组配置，返回 (待处理的 ModPlan 列表, 无效配置的摘要列表)。
+    完全相同的配置只保留第一条。没有历史耗时的模组按已知的最大耗时估计（多分支模式乘以分支数），
+    使新加入的仓库尽早开始。
+    """
+    default_cost = max(costs.values(), default=1.0)
+    plans, invalid_summaries, seen = [], [], {}
+    for index, mod_config in enumerate(mod_configs):
+        error = validate_mod_config(mod_config)
+        if error:
+            repo_slug = mod_config.get('repo') if isinstance(mod_config, dict) else None
+            print(f"配置错误：第 {index + 1} 个模组 ({repo_slug or '未命名'}) {error}")
+            invalid_summaries.append((index, repo_summary(repo_slug or f"#{index + 1}", "N/A", error=error)))
+            continue
+        fingerprint = json.dumps(mod_config, sort_keys=True)
+        if fingerprint in seen:
+            print(f"警告：第 {index + 1} 个模组与第 {seen[fingerprint] + 1} 个配置完全相同，已跳过。")
+            continue
+        seen[fingerprint] = index
+        label = mod_label(mod_config)
+        branch_count = len(mod_config['branches']) if 'branches' in mod_config else 1
+        plans.append(ModPlan(index, mod_config, label, costs.get(label, default_cost * branch_count)))
+    return plans, invalid_summaries
+
+
+def parse_shard(value):
+    """解析 --shard 参数 "i/N"（1 ≤ i ≤ N），返回 (i, N)。"""
+    match = re.fullmatch(r'(\d+)/(\d+)', value)
+    if not match or not 1 <= int(match.group(1)) <= int(match.group(2)):
+        raise argparse.ArgumentTypeError(f"分片参数应为 i/N 且 1 ≤ i ≤ N，而不是 {value!r}。")
+    return int(match.group(1)), int(match.group(2))
+
+
+def shard_plans(plans, shard_index, shard_count):
+    """
+    按预计耗时把模组分配到 shard_count 个分片（从大到小依次分给当前总耗时最小的分片），返回第 shard_index 个分片的模组。
+    分配只取决于配置与耗时统计，各分片使用相同的缓存即可得到一致的划分。
+    """
+    loads = [(0.0, shard) for shard in range(1, shard_count + 1)]
+    assigned = []
+    for plan in sorted(plans, key=lambda plan: (-plan.cost, plan.index)):
+        load, shard = heapq.heappop(loads)
+        if shard == shard_index:
+            assigned.append(plan)
+        heapq.heappush(loads, (load + plan.cost, shard))
+    return sorted(assigned, key=lambda plan: plan.index)
+
+
+class FetchSlot:
+    """
+    一个模组占用的下载名额。模组下载、解析完成后即调用 release()，
+    等待写入阶段（上游数据库准备与串行合并）期间不再占用名额。可重复释放。
+    """
+
+    def __init__(self, limiter):
+        self._limiter = limiter
+        self._held = False
 
-    return {'repo': repo_slug, 'branch': branch_name_for_summary, 'updated': update_count, 'inserted': insert_count,
-            'error': None}
+    async def acquire(self):
+        await self._limiter.acquire()
+        self._held = True
+
+    def release(self):
+        if self._held:
+            self._held = False
+            self._limiter.release()
+
+
+async def run_mod_plans(plans, run_plan, concurrency=MOD_CONCURRENCY):
+    """
+    按预计耗时从大到小启动模组，同时最多 concurrency 个模组在下载与解析，避免同时下载过多 Zip 包；
+    已交给写入阶段的模组不计入。run_plan(plan, fetch_slot) 应在下载完成后释放 fetch_slot。
+    返回 [(ModPlan, 摘要列表)]，按配置顺序排列。
+    """
+    limiter = asyncio.Semaphore(concurrency)
+
+    async def run(plan):
+        current_mod_index.set(plan.index)
+        fetch_slot = FetchSlot(limiter)
+        # 信号量按先来先得的顺序放行，因此模组按任务创建的顺序开始
+        await fetch_slot.acquire()
+        try:
+            summary = await run_plan(plan, fetch_slot)
+        finally:
+            fetch_slot.release()
+        return summary if isinstance(summary, list) else [summary]
+
+    tasks = {plan.index: asyncio.create_task(run(plan))
+             for plan in sorted(plans, key=lambda plan: (-plan.cost, plan.index))}
+    return [(plan, await tasks[plan.index]) for plan in plans]
 
 
 def initialize_db(conn):
@@ -371,14 +1455,661 @@ def initialize_db(conn):
     );
     """)
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_origin_name ON dict (ORIGIN_NAME);")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_lookup ON dict (MODID, KEY, VERSION, CURSEFORGE);")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_lookup ON dict (MODID, KEY, VERSION, CURSEFORGE);")
+    # 查询接口 (dict_lookup.py) 使用的忽略大小写索引与全文搜索表，内容在生成 Release 时填充
+    create_lookup_schema(conn)
     conn.commit()
     print("数据库初始化完成。")
 
-def regenerate_release_files():
+# --- 数据库写入阶段 ---
+
+# 一个模组（一个版本）解析出的全部词条；entries 为 (key, origin_name, trans_name) 元组。
+# modid / version / curseforge 每个批次只保存一份；diff.json 的变动条目也以批次形式交给 DiffWriter
+ModBatch = namedtuple('ModBatch', ['modid', 'version', 'curseforge', 'entries'])
+
+UPSERT_SQL = """
+    INSERT INTO dict (ORIGIN_NAME, TRANS_NAME, MODID, KEY, VERSION, CURSEFORGE) VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (MODID, KEY, VERSION, CURSEFORGE)
+    DO UPDATE SET ORIGIN_NAME=excluded.ORIGIN_NAME, TRANS_NAME=excluded.TRANS_NAME
+"""
+
+
+def ensure_unique_lookup(conn):
+    """
+    确保 idx_lookup 为 (MODID, KEY, VERSION, CURSEFORGE) 上的唯一索引，供 UPSERT 使用。
+    上游数据库中的该索引不唯一，若存在重复条目则只保留 ID 最大的一条。
+    """
+    indexes = {row[1]: row[2] for row in conn.execute("PRAGMA index_list(dict)")}
+    if indexes.get('idx_lookup'):
+        return
+    removed = conn.execute("""
+        DELETE FROM dict WHERE ID NOT IN (SELECT MAX(ID) FROM dict GROUP BY MODID, KEY, VERSION, CURSEFORGE)
+    """).rowcount
+    if removed:
+        print(f"已移除 {removed} 个重复的 (MODID, KEY, VERSION, CURSEFORGE) 条目。")
+    conn.execute("DROP INDEX IF EXISTS idx_lookup")
+    conn.execute("CREATE UNIQUE INDEX idx_lookup ON dict (MODID, KEY, VERSION, CURSEFORGE)")
+
+
+def begin_bulk_load(conn):
+    """切换到自动提交模式（事务由每个批次显式控制），并为批量写入调整 pragma。"""
+    conn.isolation_level = None
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA cache_size=-65536")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("BEGIN")
+    try:
+        ensure_unique_lookup(conn)
+        # 变更日志：记录本次合并修改过的行及其修改前的原文，供增量生成 Release 文件使用
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS dict_journal(
+                MODID           TEXT    NOT NULL,
+                KEY             TEXT    NOT NULL,
+                VERSION         TEXT    NOT NULL,
+                CURSEFORGE      TEXT    NOT NULL,
+                OLD_ORIGIN_NAME TEXT,
+                PRIMARY KEY (MODID, KEY, VERSION, CURSEFORGE)
+            )
+        """)
+        conn.execute("DELETE FROM dict_journal")
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def finish_bulk_load(conn):
+    """合并结束后切回回滚日志模式，使发布的数据库文件不依赖 -wal 文件。"""
+    conn.execute("PRAGMA journal_mode=DELETE")
+
+
+# 批次的合并结果；changed 为真正写入的 (key, origin_name, trans_name)，顺序与批次一致
+MergeResult = namedtuple('MergeResult', ['updated', 'inserted', 'unchanged', 'removed', 'changed'])
+
+
+def read_existing_rows(conn, batches):
+    """
+    读出各批次对应模组版本现有的原文与译文，返回 {(modid, version, curseforge): {key: (原文, 译文)}}。
+    同一模组的多个版本只查询一次。
+    """
+    versions_by_mod = {}
+    for batch in batches:
+        versions_by_mod.setdefault((batch.modid, batch.curseforge), []).append(batch.version)
+    existing = {(batch.modid, batch.version, batch.curseforge): {} for batch in batches}
+    for (modid, curseforge), versions in versions_by_mod.items():
+        rows = conn.execute(
+            "SELECT VERSION, KEY, ORIGIN_NAME, TRANS_NAME FROM dict "
+            f"WHERE MODID=? AND CURSEFORGE=? AND VERSION IN ({', '.join('?' * len(versions))})",
+            (modid, curseforge, *versions))
+        for version, key, origin_name, trans_name in rows:
+            existing[modid, version, curseforge][key] = (origin_name, trans_name)
+    return existing
+
+
+def merge_batch(conn, batch, existing):
+    """
+    将词条分为未变 / 更新 / 新增 / 源中已移除四类，只对更新和新增的条目执行 UPSERT。
+    源中已移除的条目仍保留在数据库中，仅计数。
+    """
+    changed = []
+    journal = []
+    for entry in batch.entries:
+        key, origin_name, trans_name = entry
+        current = existing.pop(key, None)
+        if current is None or current != (origin_name, trans_name):
+            changed.append(entry)
+            journal.append((batch.modid, key, batch.version, batch.curseforge, current and current[0]))
+    if changed:
+        conn.executemany(UPSERT_SQL, (
+            (origin_name, trans_name, batch.modid, key, batch.version, batch.curseforge)
+            for key, origin_name, trans_name in changed))
+        # 同一行在一次运行中多次修改时，只保留最初的原文
+        conn.executemany("INSERT OR IGNORE INTO dict_journal VALUES (?, ?, ?, ?, ?)", journal)
+    updated = sum(1 for *_, old_origin in journal if old_origin is not None)
+    return MergeResult(updated=updated, inserted=len(changed) - updated,
+                       unchanged=len(batch.entries) - len(changed), removed=len(existing), changed=changed)
+
+
+def apply_batches(conn, batches):
+    """
+    在一个显式事务中合并多个批次（通常是同一模组的各个版本），返回各批次的 MergeResult。
+    各批次的 (modid, version, curseforge) 必须互不相同。
+    """
+    conn.execute("BEGIN")
+    try:
+        existing = read_existing_rows(conn, batches)
+        results = [merge_batch(conn, batch, existing[batch.modid, batch.version, batch.curseforge])
+                   for batch in batches]
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return results
+
+
+def apply_batch(conn, batch):
+    """在一个显式事务中合并一个批次。"""
+    return apply_batches(conn, [batch])[0]
+
+
+async def submit_batches(write_queue, batches):
+    """将一组批次放入写入队列，等待写入阶段在同一事务中合并并返回各批次的 MergeResult。"""
+    done = asyncio.get_running_loop().create_future()
+    await write_queue.put((batches, done, current_repo.get(), current_mod_index.get()))
+    return await done
+
+
+async def submit_batch(write_queue, batch):
+    """将批次放入写入队列，等待写入阶段返回 MergeResult。"""
+    return (await submit_batches(write_queue, [batch]))[0]
+
+
+async def run_db_writer(db_ready, write_queue, shard_results=None):
+    """
+    唯一的数据库写入者：等待基础数据库就绪后，按到达顺序在工作线程中逐组应用批次。
+    分片运行时同时把批次记录到 shard_results。队列中出现 None 表示所有模组已处理完毕。
+    """
+    conn, error = None, None
+    try:
+        conn, _ = await db_ready
+        await asyncio.to_thread(begin_bulk_load, conn)
+    except Exception as e:
+        error = e
+
+    while (item := await write_queue.get()) is not None:
+        batches, done, repo, mod_index = item
+        if error is not None:
+            done.set_exception(RuntimeError(f"数据库不可用: {error}"))
+            continue
+        try:
+            with metrics.stage('merge', repo):
+                results = await asyncio.to_thread(apply_batches, conn, batches)
+            if shard_results is not None:
+                await asyncio.to_thread(shard_results.record_batches, mod_index, batches)
+            metrics.add('merge', repo, rows=sum(len(batch.entries) for batch in batches),
+                        rows_written=sum(len(result.changed) for result in results))
+            done.set_result(results)
+        except Exception as e:
+            done.set_exception(e)
+
+    if error is not None:
+        raise error
+    await asyncio.to_thread(finish_bulk_load, conn)
+
+class ShardResults:
+    """
+    分片运行 (--shard i/N) 的部分结果，保存为一个 SQLite 文件：各模组提交的完整批次、Release 正文的摘要行与运行统计。
+    合并阶段 (--merge-shards) 在上游数据库上按模组在配置中的顺序重放全部批次，因此结果与分片的完成顺序无关。
+    """
+
+    SCHEMA = """
+    CREATE TABLE meta(KEY TEXT PRIMARY KEY, VALUE TEXT NOT NULL);
+    CREATE TABLE batches(ID INTEGER PRIMARY KEY, MOD_INDEX INTEGER NOT NULL,
+                         MODID TEXT NOT NULL, VERSION TEXT NOT NULL, CURSEFORGE TEXT NOT NULL);
+    CREATE TABLE entries(BATCH_ID INTEGER NOT NULL, KEY TEXT NOT NULL, ORIGIN_NAME TEXT NOT NULL, TRANS_NAME TEXT NOT NULL);
+    CREATE TABLE summaries(MOD_INDEX INTEGER NOT NULL, POSITION INTEGER NOT NULL, SUMMARY TEXT NOT NULL);
+    """
+
+    def __init__(self, path, shard_index, shard_count, config_digest):
+        Path(path).unlink(missing_ok=True)
+        self.path = path
+        self.shard_index, self.shard_count = shard_index, shard_count
+        self._conn = connect_for_writer(path)
+        self._conn.executescript(self.SCHEMA)
+        self._conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ('shard_index', str(shard_index)), ('shard_count', str(shard_count)), ('config', config_digest)])
+        self._conn.commit()
+
+    def record_plan(self, plans, assigned):
+        """记录全部模组与分给本分片的模组（配置中的位置），合并时据此检查各分片的划分是否一致。"""
+        self._conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ('planned', json.dumps([plan.index for plan in plans])),
+            ('assigned', json.dumps([plan.index for plan in assigned]))])
+        self._conn.commit()
+
+    def record_batches(self, mod_index, batches):
+        for batch in batches:
+            batch_id = self._conn.execute(
+                "INSERT INTO batches (MOD_INDEX, MODID, VERSION, CURSEFORGE) VALUES (?, ?, ?, ?)",
+                (mod_index, batch.modid, batch.version, batch.curseforge)).lastrowid
+            self._conn.executemany("INSERT INTO entries VALUES (?, ?, ?, ?)",
+                                   ((batch_id, *entry) for entry in batch.entries))
+        self._conn.commit()
+
+    def finish(self, summaries, metrics_report):
+        """写入摘要行 [(模组位置, 摘要)] 与运行统计并关闭文件。"""
+        positions = {}
+        for mod_index, summary in summaries:
+            positions[mod_index] = positions.get(mod_index, -1) + 1
+            self._conn.execute("INSERT INTO summaries VALUES (?, ?, ?)",
+                               (mod_index, positions[mod_index], json.dumps(summary, ensure_ascii=False)))
+        self._conn.execute("INSERT INTO meta VALUES ('metrics', ?)", (json.dumps(metrics_report, ensure_ascii=False),))
+        self._conn.commit()
+        self._conn.close()
+
+    @staticmethod
+    def load(path):
+        """读取一个分片文件，返回 (meta, {模组位置: [ModBatch]}, [(模组位置, 摘要)])。"""
+        conn = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            meta = dict(conn.execute("SELECT KEY, VALUE FROM meta"))
+            entries = {}
+            for batch_id, *entry in conn.execute(
+                    "SELECT BATCH_ID, KEY, ORIGIN_NAME, TRANS_NAME FROM entries ORDER BY rowid"):
+                entries.setdefault(batch_id, []).append(tuple(entry))
+            groups = {}
+            for batch_id, mod_index, modid, version, curseforge in conn.execute(
+                    "SELECT ID, MOD_INDEX, MODID, VERSION, CURSEFORGE FROM batches ORDER BY ID"):
+                groups.setdefault(mod_index, []).append(
+                    ModBatch(modid, version, curseforge, tuple(entries.pop(batch_id, ()))))
+            summaries = [(mod_index, json.loads(summary)) for mod_index, summary in conn.execute(
+                "SELECT MOD_INDEX, SUMMARY FROM summaries ORDER BY MOD_INDEX, POSITION")]
+        finally:
+            conn.close()
+        return meta, groups, summaries
+
+
+def load_shards(paths):
+    """
+    读取并检查全部分片文件：分片数一致、编号不重复不缺失、使用同一份配置，且每个模组恰好由一个分片处理。
+    返回按分片编号排列的结果。
+    """
+    shards = sorted((ShardResults.load(path) for path in paths), key=lambda shard: int(shard[0]['shard_index']))
+    counts = {shard[0]['shard_count'] for shard in shards}
+    configs = {shard[0]['config'] for shard in shards}
+    indexes = [int(shard[0]['shard_index']) for shard in shards]
+    if len(counts) != 1 or indexes != list(range(1, int(counts.pop()) + 1)):
+        raise ValueError(f"分片文件不完整或重复：收到分片 {indexes}。")
+    if len(configs) != 1:
+        raise ValueError("各分片使用的模组配置不一致，无法合并。")
+    planned = {shard[0]['planned'] for shard in shards}
+    assigned = [index for shard in shards for index in json.loads(shard[0]['assigned'])]
+    if len(planned) != 1 or sorted(assigned) != json.loads(planned.pop()):
+        raise ValueError("各分片的模组划分不一致（可能使用了不同的运行统计缓存），请用相同的缓存重新运行全部分片。")
+    return shards
+
+
+async def replay_shards(shards, write_queue, diff_writer):
+    """
+    按模组在配置中的顺序把各分片的批次重新合并到上游数据库，写出 diff 并以合并结果更新摘要行。
+    返回按配置顺序排列的摘要列表。
+    """
+    groups, summaries = {}, {}
+    for meta, shard_groups, shard_summaries in shards:
+        groups.update(shard_groups)
+        for mod_index, summary in shard_summaries:
+            summaries.setdefault(mod_index, []).append(summary)
+        metrics.absorb(json.loads(meta['metrics']))
+
+    for mod_index in sorted(groups):
+        batches = groups.pop(mod_index)
+        results = await submit_batches(write_queue, batches)
+        # 成功的摘要行与批次一一对应且顺序相同
+        merged = [summary for summary in summaries.get(mod_index, []) if not summary['error']]
+        for batch, result, summary in zip(batches, results, merged):
+            write_merge_result(diff_writer, batch, result, f"{summary['repo']}@{summary['branch']}")
+            summary.update(repo_summary(summary['repo'], summary['branch'], result, summary['cache_hit']))
+    return [summary for mod_index in sorted(summaries) for summary in summaries[mod_index]]
+
+
+class JsonArrayWriter:
+    """
+    逐个写入 JSON 数组元素，无需先在内存中构造整个列表。
+    输出与 json.dumps(list, ensure_ascii=False, indent=4) 逐字节一致。
+    """
+
+    def __init__(self, f):
+        self._f = f
+        self.count = 0
+
+    @staticmethod
+    def encode(item):
+        # 字符串中的换行都已转义，因此逐行加一级缩进即可得到嵌套在数组中的格式
+        return json.dumps(item, ensure_ascii=False, indent=4).replace('\n', '\n    ')
+
+    def write(self, item):
+        self.write_encoded(self.encode(item))
+
+    def write_encoded(self, text):
+        """写入 encode() 产生的元素文本。"""
+        self._f.write(('[\n    ' if self.count == 0 else ',\n    ') + text)
+        self.count += 1
+
+    def close(self):
+        self._f.write('\n]' if self.count else '[]')
+
+
+def iter_json_array_elements(path):
+    """
+    逐个读出 JsonArrayWriter 写出的数组元素文本（与 encode() 的结果相同），不解析 JSON。
+    每个元素都是只含字符串值的平铺对象，以单独一行的 "    }" 结束。
+    """
+    with open(path, 'r', encoding='utf-8', buffering=EXPORT_BUFFER_SIZE) as f:
+        if f.readline().rstrip('\n') == '[]':
+            return
+        lines = []
+        for line in f:
+            lines.append(line)
+            if line.startswith('    }'):
+                yield ''.join(lines).rstrip('\n').rstrip(',')[4:]
+                lines = []
+
+
+def dict_element(origin_name, trans_name, modid, key, version, curseforge):
+    """Dict.json 中的一个元素。"""
+    return {'origin_name': origin_name, 'trans_name': trans_name, 'modid': modid, 'key': key,
+            'version': version, 'curseforge': curseforge}
+
+
+DICT_EXPORT_SQL = "SELECT ID, ORIGIN_NAME, TRANS_NAME, MODID, KEY, VERSION, CURSEFORGE FROM dict"
+
+# 导出过滤器：keep(row) 判断 DICT_EXPORT_SQL 的一行 (ID, 原文, 译文, modid, key, version, curseforge) 是否导出。
+# 多个过滤器按顺序执行，被移除的行只计入第一个移除它的过滤器
+ExportFilter = namedtuple('ExportFilter', ['name', 'label', 'keep'])
+
+ORIGIN_LENGTH_FILTER = ExportFilter('origin_length', '原文为空或超过 50 个字符', lambda row: 0 < len(row[1]) <= 50)
+IDENTICAL_FILTER = ExportFilter('identical', '原文与译文相同', lambda row: row[1] != row[2])
+
+# Dict.json 与源项目保持一致，只排除原文为空或过长的词条
+DICT_FILTERS = (ORIGIN_LENGTH_FILTER,)
+
+# JsonArrayWriter 在每个元素前写入的分隔符与缩进
+JSON_ELEMENT_SEPARATOR_SIZE = len(',\n    ')
+
+
+def filter_rows(rows, filters, removed=None):
+    """依次用 filters 过滤行；提供 removed 时按过滤器名称累计移除的词条数及其在 JSON 数组中占用的字节数。"""
+    for row in rows:
+        for export_filter in filters:
+            if not export_filter.keep(row):
+                if removed is not None:
+                    stats = removed.setdefault(export_filter.name,
+                                               {'label': export_filter.label, 'entries': 0, 'bytes': 0})
+                    stats['entries'] += 1
+                    stats['bytes'] += (len(JsonArrayWriter.encode(dict_element(*row[1:])).encode('utf-8'))
+                                       + JSON_ELEMENT_SEPARATOR_SIZE)
+                break
+        else:
+            yield row
+
+
+def iter_dict_elements(cursor, where="", filters=DICT_FILTERS, removed=None):
+    """按 ID 顺序产出 (ID, 元素文本)，跳过被过滤器移除的词条。"""
+    cursor.execute(f"{DICT_EXPORT_SQL} {where} ORDER BY ID")
+    for row_id, *row in filter_rows(iter_rows(cursor), filters, removed):
+        yield row_id, JsonArrayWriter.encode(dict_element(*row))
+
+
+def duplicate_row_ids(conn, partition_rows=DEDUP_PARTITION_ROWS):
     """
-    从更新后的数据库重新生成 Dict.json 和 Dict-Mini.json。
+    按 ID 升序产出与某个 ID 更小的行 (modid, key, 原文, 译文) 完全相同的行，通常是同一词条在多个版本中的副本。
+    每行只保留 ID 与 128 位 BLAKE2b 摘要，按摘要分区写入临时文件后逐个分区去重，内存占用取决于分区大小而不是总行数。
+    128 位摘要的碰撞概率可以忽略，不会把不同的词条误判为重复而从导出文件中移除。
+    """
+    total = conn.execute("SELECT COUNT(*) FROM dict").fetchone()[0]
+    partition_count = max(1, -(-total // partition_rows))
+    partitions = [tempfile.SpooledTemporaryFile(max_size=DEDUP_SPOOL_MAX_SIZE) for _ in range(partition_count)]
+    buffers = [array('q') for _ in range(partition_count)]
+    cursor = conn.execute("SELECT ID, MODID, KEY, ORIGIN_NAME, TRANS_NAME FROM dict ORDER BY ID")
+    for row_id, *fields in iter_rows(cursor):
+        # JSON 编码保证字段边界无歧义；摘要拆成两个 64 位整数存入分区
+        digest = hashlib.blake2b(json.dumps(fields, ensure_ascii=False).encode('utf-8'), digest_size=16).digest()
+        high, low = (int.from_bytes(digest[:8], 'little', signed=True),
+                     int.from_bytes(digest[8:], 'little', signed=True))
+        buffer = buffers[high % partition_count]
+        buffer.extend((row_id, high, low))
+        if len(buffer) >= 3 * EXPORT_BATCH_SIZE:
+            partitions[high % partition_count].write(buffer.tobytes())
+            del buffer[:]
+
+    duplicates = []
+    for partition, buffer in zip(partitions, buffers):
+        records = array('q')
+        partition.seek(0)
+        records.frombytes(partition.read())
+        partition.close()
+        records.extend(buffer)
+        seen, ids = set(), array('q')
+        # 分区内的记录按 ID 升序写入，先出现的即为保留的一行
+        for row_id, fingerprint in zip(records[0::3], zip(records[1::3], records[2::3])):
+            if fingerprint in seen:
+                ids.append(row_id)
+            else:
+                seen.add(fingerprint)
+        duplicates.append(ids)
+        del records, seen
+    return heapq.merge(*duplicates)
+
+
+def excluding_ids(sorted_ids):
+    """返回 keep 函数：行 ID 不在升序的 sorted_ids 中时保留。各行须按 ID 升序传入。"""
+    ids = iter(sorted_ids)
+    next_id = next(ids, None)
+
+    def keep(row):
+        nonlocal next_id
+        while next_id is not None and next_id < row[0]:
+            next_id = next(ids, None)
+        return next_id != row[0]
+    return keep
+
+
+def build_dedup_json(conn, path):
+    """
+    生成去重版词典：在 Dict.json 的基础上再去掉原文与译文相同的词条，以及同一模组同一键在多个版本中
+    原文、译文都相同的副本（保留 ID 最小的一条）。格式与 Dict.json 相同。返回 (词条数, 各过滤器的移除统计)。
+    """
+    filters = DICT_FILTERS + (
+        IDENTICAL_FILTER,
+        ExportFilter('duplicate', '多个版本中完全重复', excluding_ids(duplicate_row_ids(conn))),
+    )
+    removed = {export_filter.name: {'label': export_filter.label, 'entries': 0, 'bytes': 0}
+               for export_filter in filters}
+    element_ids = write_dict_json(path, iter_dict_elements(conn.cursor(), filters=filters, removed=removed))
+    return len(element_ids), removed
+
+
+def write_dict_json(path, elements):
+    """写出 Dict.json，返回各元素对应的 ID 数组（供增量生成定位元素）。"""
+    element_ids = array('q')
+    with open(path, 'w', encoding='utf-8', buffering=EXPORT_BUFFER_SIZE) as f:
+        writer = JsonArrayWriter(f)
+        for row_id, text in elements:
+            writer.write_encoded(text)
+            element_ids.append(row_id)
+        writer.close()
+    return element_ids
+
+
+# Dict-Mini 的排名在数据库中完成：按 (原文, 译文) 分组计数，原文按首次出现的 ID 排序，
+# 同一原文内按次数降序、次数相同按首次出现的 ID 升序，与 Counter.most_common() 的顺序一致
+MINI_RANKING_SQL = """
+    SELECT ORIGIN_FIRST_ID, ORIGIN_NAME, TRANS_NAME FROM (
+        SELECT ORIGIN_NAME, TRANS_NAME, COUNT(*) AS CNT, MIN(ID) AS FIRST_ID,
+               MIN(MIN(ID)) OVER (PARTITION BY ORIGIN_NAME) AS ORIGIN_FIRST_ID
+        FROM dict
+        WHERE ORIGIN_NAME != '' AND length(ORIGIN_NAME) <= 50 AND ORIGIN_NAME != TRANS_NAME {where}
+        GROUP BY ORIGIN_NAME, TRANS_NAME
+    )
+    ORDER BY ORIGIN_FIRST_ID, CNT DESC, FIRST_ID
+"""
+
+
+def iter_mini_entries(cursor, where=""):
+    """执行排名查询，逐个产出 (首次出现的 ID, 原文, 按频次排序的译文列表)；同一原文的行在结果中是连续的。"""
+    cursor.execute(MINI_RANKING_SQL.format(where=where))
+    current, ranked = None, []
+    for first_id, origin_name, trans_name in iter_rows(cursor):
+        if (first_id, origin_name) != current:
+            if ranked:
+                yield (*current, ranked)
+            current, ranked = (first_id, origin_name), []
+        ranked.append(trans_name)
+    if ranked:
+        yield (*current, ranked)
+
+
+def write_mini_json(path, mini_entries):
+    """
+    流式写出 Dict-Mini.json，输出与一次性 json.dumps(separators=(',', ':')) 逐字节一致。
+    返回各原文首次出现的 ID 数组（供增量生成排序）。
+    """
+    first_ids = array('q')
+    with open(path, 'w', encoding='utf-8', buffering=EXPORT_BUFFER_SIZE) as f:
+        f.write('{')
+        for first_id, origin_name, ranked in mini_entries:
+            if first_ids:
+                f.write(',')
+            f.write(json.dumps(origin_name, ensure_ascii=False))
+            f.write(':')
+            f.write(json.dumps(ranked, ensure_ascii=False, separators=(',', ':')))
+            first_ids.append(first_id)
+        f.write('}')
+    return first_ids
+
+
+def iter_rows(cursor, batch_size=EXPORT_BATCH_SIZE):
+    """按批从游标中取出结果行。"""
+    while rows := cursor.fetchmany(batch_size):
+        yield from rows
+
+# --- 增量生成 Release 文件 ---
+
+def read_journal(conn):
+    """读取本次合并的变更日志，返回 (被修改行的 ID 集合, 涉及的原文集合)。"""
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='dict_journal'").fetchone():
+        return set(), set()
+    touched_ids, touched_origins = set(), set()
+    for row_id, old_origin, new_origin in conn.execute("""
+        SELECT d.ID, j.OLD_ORIGIN_NAME, d.ORIGIN_NAME
+        FROM dict_journal AS j JOIN dict AS d USING (MODID, KEY, VERSION, CURSEFORGE)
+    """):
+        touched_ids.add(row_id)
+        touched_origins.add(new_origin)
+        if old_origin is not None:
+            touched_origins.add(old_origin)
+    return touched_ids, touched_origins
+
+
+def load_release_state(base_fingerprint):
+    """
+    读取上次运行保存的 Release 快照。快照对应“基础数据库 + 上次的变更日志”，
+    只有基础数据库与本次相同时才可用于增量生成。
+    """
+    if base_fingerprint is None:
+        return None
+    try:
+        state = json.loads((RELEASE_STATE_DIR / "state.json").read_text(encoding='utf-8'))
+        element_ids, first_ids = array('q'), array('q')
+        element_ids.frombytes((RELEASE_STATE_DIR / "dict_ids.bin").read_bytes())
+        first_ids.frombytes((RELEASE_STATE_DIR / "mini_ids.bin").read_bytes())
+    except (OSError, ValueError):
+        return None
+    if state.get('base') != base_fingerprint:
+        return None
+    if not (RELEASE_STATE_DIR / JSON_FILENAME).exists() or not (RELEASE_STATE_DIR / MINI_JSON_FILENAME).exists():
+        return None
+    state['dict_ids'], state['mini_ids'] = element_ids, first_ids
+    return state
+
+
+def save_release_state(base_fingerprint, json_path, element_ids, mini_path, first_ids, touched_ids, touched_origins):
+    RELEASE_STATE_DIR.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(json_path, RELEASE_STATE_DIR / JSON_FILENAME)
+    shutil.copyfile(mini_path, RELEASE_STATE_DIR / MINI_JSON_FILENAME)
+    (RELEASE_STATE_DIR / "dict_ids.bin").write_bytes(element_ids.tobytes())
+    (RELEASE_STATE_DIR / "mini_ids.bin").write_bytes(first_ids.tobytes())
+    (RELEASE_STATE_DIR / "state.json").write_text(json.dumps({
+        'base': base_fingerprint,
+        'touched_ids': sorted(touched_ids),
+        'touched_origins': sorted(touched_origins),
+    }, ensure_ascii=False), encoding='utf-8')
+
+
+def fill_temp_table(conn, name, column, values):
+    conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {name} ({column} PRIMARY KEY)")
+    conn.execute(f"DELETE FROM temp.{name}")
+    conn.executemany(f"INSERT OR IGNORE INTO temp.{name} VALUES (?)", ((value,) for value in values))
+
+
+def patch_dict_elements(conn, state, patch_ids):
+    """快照中的元素与需要重新读取的行按 ID 归并；patch_ids 内的行以数据库当前内容为准。"""
+    fill_temp_table(conn, 'patch_ids', 'ID INTEGER', patch_ids)
+    prior = ((row_id, text) for row_id, text in zip(state['dict_ids'],
+                                                    iter_json_array_elements(RELEASE_STATE_DIR / JSON_FILENAME))
+             if row_id not in patch_ids)
+    patched = iter_dict_elements(conn.cursor(), "WHERE ID IN (SELECT ID FROM temp.patch_ids)")
+    return heapq.merge(prior, patched, key=itemgetter(0))
+
+
+def patch_mini_entries(conn, state, affected_origins):
+    """快照中未受影响的原文沿用原排名，受影响的原文在数据库中重新排名，再按首次出现的 ID 归并。"""
+    fill_temp_table(conn, 'mini_origins', 'ORIGIN_NAME TEXT', affected_origins)
+    prior_mini = json.loads((RELEASE_STATE_DIR / MINI_JSON_FILENAME).read_text(encoding='utf-8'))
+    prior = ((first_id, origin_name, ranked) for first_id, (origin_name, ranked) in zip(state['mini_ids'], prior_mini.items())
+             if origin_name not in affected_origins)
+    recomputed = iter_mini_entries(conn.cursor(), "AND ORIGIN_NAME IN (SELECT ORIGIN_NAME FROM temp.mini_origins)")
+    return heapq.merge(prior, recomputed, key=itemgetter(0))
+
+
+def finalize_release_file(tmp_path, final_path, count, kind):
+    if count:
+        tmp_path.replace(final_path)
+        print(f'已生成 {final_path}，共有{kind} {count} 个')
+    else:
+        tmp_path.unlink()
+        print(f'{final_path} 为空，不生成文件。')
+
+
+def add_to_mini_bin(mini_entries, mini_bin):
+    """原样产出 Dict-Mini 的条目，同时交给 Dict-Mini.bin 的写入器。"""
+    for entry in mini_entries:
+        mini_bin.add(entry[1], entry[2])
+        yield entry
+
+
+def build_release_files(conn, json_path, mini_path, state=None, touched_ids=(), touched_origins=(),
+                        mini_bin=None):
+    """
+    生成两个 Release 文件；提供快照时只重新读取快照与本次变更涉及的行和原文。
+    提供 MiniBinWriter 时，Dict-Mini 的条目同时写入其中。
+    """
+    if state is None:
+        element_ids = write_dict_json(json_path, iter_dict_elements(conn.cursor()))
+        mini_entries = iter_mini_entries(conn.cursor())
+    else:
+        # 快照相对基础数据库修改过的行与本次修改的行，是两者之间唯一可能不同的行
+        patch_ids = set(state['touched_ids']) | touched_ids
+        affected_origins = set(state['touched_origins']) | touched_origins
+        print(f"增量模式：重新读取 {len(patch_ids)} 行，重新排名 {len(affected_origins)} 个原文。")
+        element_ids = write_dict_json(json_path, patch_dict_elements(conn, state, patch_ids))
+        mini_entries = patch_mini_entries(conn, state, affected_origins)
+    if mini_bin is not None:
+        mini_entries = add_to_mini_bin(mini_entries, mini_bin)
+    first_ids = write_mini_json(mini_path, mini_entries)
+    return element_ids, first_ids
+
+
+def verify_incremental_release(conn, json_path, mini_path):
+    """完整重建一次并与增量结果逐字节比较（设置 VERIFY_INCREMENTAL_RELEASE=1 时启用）。"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        full_json, full_mini = Path(tmpdir) / JSON_FILENAME, Path(tmpdir) / MINI_JSON_FILENAME
+        build_release_files(conn, full_json, full_mini)
+        for incremental, full in ((json_path, full_json), (mini_path, full_mini)):
+            if not filecmp.cmp(incremental, full, shallow=False):
+                raise RuntimeError(f"增量生成的 {incremental.name[:-len('.tmp')]} 与完整重建的结果不一致。")
+    print("校验通过：增量生成的结果与完整重建一致。")
+
+
+def regenerate_release_files(base_fingerprint=None, dedup=False):
+    """
+    从更新后的数据库重新生成 Dict.json 和 Dict-Mini.json；dedup 为真时另外生成去重版 Dict-Dedup.json。
     此函数的逻辑严格遵循参考项目的代码，以确保生成的文件内容和格式一致。
+    数据库按批读取并逐条写入文件；Dict-Mini 的分组计数与排序由 SQLite 完成，结果已按顺序流式读出。
+
+    若缓存中有基于同一基础数据库的上次快照，则只根据变更日志 (dict_journal) 修补快照，
+    结果与完整重建相同；否则完整重建。两种情况都会保存新的快照。
     """
     print("\n--- 开始从数据库重新生成 Release 文件 (遵循源项目逻辑) ---")
     if not Path(DB_FILENAME).exists():
@@ -386,51 +2117,215 @@ def regenerate_release_files():
         return
 
     conn = sqlite3.connect(DB_FILENAME)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-
-    print(f"正在生成 {JSON_FILENAME}...")
-    cursor.execute("SELECT ORIGIN_NAME, TRANS_NAME, MODID, KEY, VERSION, CURSEFORGE FROM dict")
-    all_db_entries = [
-        {'origin_name': r['ORIGIN_NAME'], 'trans_name': r['TRANS_NAME'], 'modid': r['MODID'], 'key': r['KEY'],
-         'version': r['VERSION'], 'curseforge': r['CURSEFORGE']} for r in cursor.fetchall()]
+    # 分组排序的中间结果较大，放在内存中的临时表里完成
+    conn.execute("PRAGMA temp_store=MEMORY")
+
+    touched_ids, touched_origins = read_journal(conn)
+    state = load_release_state(base_fingerprint)
+    if state is None:
+        print("未找到可用的 Release 快照，完整重建。")
+
+    json_tmp_path = Path(JSON_FILENAME + '.tmp')
+    mini_tmp_path = Path(MINI_JSON_FILENAME + '.tmp')
+    mini_bin_tmp_path = Path(MINI_BIN_FILENAME + '.tmp')
+    mini_bin = MiniBinWriter()
+    print(f"正在生成 {JSON_FILENAME}、{MINI_JSON_FILENAME} 与 {MINI_BIN_FILENAME}...")
+    element_ids, first_ids = build_release_files(conn, json_tmp_path, mini_tmp_path, state,
+                                                 touched_ids, touched_origins, mini_bin)
+    mini_bin.write(mini_bin_tmp_path)
+    if state is not None and os.getenv("VERIFY_INCREMENTAL_RELEASE") == "1":
+        verify_incremental_release(conn, json_tmp_path, mini_tmp_path)
+
+    save_release_state(base_fingerprint, json_tmp_path, element_ids, mini_tmp_path, first_ids,
+                       touched_ids, touched_origins)
+    # 变更日志只在生成期间使用，不随数据库发布
+    conn.execute("DROP TABLE IF EXISTS dict_journal")
+    conn.commit()
+    print("正在重建查询索引与全文搜索表...")
+    with metrics.stage('lookup_index'):
+        rebuild_lookup_indexes(conn)
+    if dedup:
+        dedup_tmp_path = Path(DEDUP_JSON_FILENAME + '.tmp')
+        print(f"正在生成 {DEDUP_JSON_FILENAME}...")
+        with metrics.stage('dedup_json'):
+            dedup_count, removed = build_dedup_json(conn, dedup_tmp_path)
+        metrics.record_filters(DEDUP_JSON_FILENAME, dedup_count, removed)
+        for stats in removed.values():
+            print(f"  {stats['label']}: 移除 {stats['entries']} 个词条，{format_mib(stats['bytes'])} MiB")
     conn.close()
 
-    integral = []
-    integral_mini_temp = defaultdict(list)
+    finalize_release_file(json_tmp_path, JSON_FILENAME, len(element_ids), '词条')
+    finalize_release_file(mini_tmp_path, MINI_JSON_FILENAME, len(first_ids), '词条')
+    finalize_release_file(mini_bin_tmp_path, MINI_BIN_FILENAME, len(first_ids), '原文')
+    if dedup:
+        finalize_release_file(dedup_tmp_path, DEDUP_JSON_FILENAME, dedup_count, '词条')
+    release_files = [Path(name) for name in (JSON_FILENAME, MINI_JSON_FILENAME, MINI_BIN_FILENAME)]
+    if dedup:
+        release_files.append(Path(DEDUP_JSON_FILENAME))
+    metrics.add('release_files', rows=len(element_ids) + len(first_ids),
+                bytes=sum(path.stat().st_size for path in release_files if path.exists()))
 
-    print(f'处理 {len(all_db_entries)} 个词条中...')
-    for entry in all_db_entries:
-        if len(entry['origin_name']) > 50 or entry['origin_name'] == '': continue
-        integral.append(entry)
-        if entry['origin_name'] != entry['trans_name']:
-            integral_mini_temp[entry['origin_name']].append(entry['trans_name'])
+def diff_element(batch, key, origin_name, trans_name):
+    """diff.json 中的一个元素。"""
+    return {'origin_name': origin_name, 'trans_name': trans_name, 'modid': batch.modid, 'key': key,
+            'version': batch.version, 'curseforge': batch.curseforge}
 
-    # 使用 Counter 进行高效排序
-    integral_mini_final = {
-        origin_name: [item for item, count in Counter(trans_list).most_common()]
-        for origin_name, trans_list in integral_mini_temp.items()
-    }
 
-    print('开始生成整合文件')
+class DiffWriter:
+    """
+    各模组合并完成后立即把变动条目追加到 diff.json（以及可选的 diff.ndjson），
+    不在内存中保留整个运行的变动列表。文件先写入 .tmp，正常结束时才替换正式文件。
+    """
 
-    text = json.dumps(integral, ensure_ascii=False, indent=4)
-    mini_text = json.dumps(integral_mini_final, ensure_ascii=False, separators=(',', ':'))
+    def __init__(self, path=DIFF_JSON_FILENAME, ndjson_path=None):
+        self._paths = [Path(path)] + ([Path(ndjson_path)] if ndjson_path else [])
+        self._files = [open(self._tmp_path(p), 'w', encoding='utf-8', buffering=EXPORT_BUFFER_SIZE)
+                       for p in self._paths]
+        self._writer = JsonArrayWriter(self._files[0])
+        self._ndjson = self._files[1] if ndjson_path else None
+
+    @staticmethod
+    def _tmp_path(path):
+        return path.with_name(path.name + '.tmp')
+
+    @property
+    def count(self):
+        return self._writer.count
+
+    def write_batch(self, batch):
+        with metrics.stage('diff_json'):
+            for entry in batch.entries:
+                element = diff_element(batch, *entry)
+                self._writer.write(element)
+                if self._ndjson is not None:
+                    self._ndjson.write(json.dumps(element, ensure_ascii=False) + '\n')
+
+    def close(self):
+        self._writer.close()
+        for f in self._files:
+            f.close()
+        for path in self._paths:
+            os.replace(self._tmp_path(path), path)
+        metrics.add('diff_json', rows=self.count, bytes=sum(path.stat().st_size for path in self._paths))
+        print(f"{', '.join(map(str, self._paths))} 生成完毕，包含 {self.count} 个变动条目。")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+            return
+        # 运行中断时丢弃不完整的文件
+        for f, path in zip(self._files, self._paths):
+            f.close()
+            self._tmp_path(path).unlink(missing_ok=True)
+
+
+def compress_release_files(formats):
+    """按需为 Dict.json、Dict-Mini.json、Dict-Dedup.json 与 diff.json 生成 .gz / .zst 压缩版本，流式压缩。"""
+    compressors = []
+    if 'gzip' in formats:
+        compressors.append(('.gz', lambda f: gzip.GzipFile(fileobj=f, mode='wb', compresslevel=GZIP_LEVEL, mtime=0)))
+    if 'zstd' in formats:
+        if zstandard is None:
+            print("警告：未安装 zstandard，跳过生成 .zst 文件。")
+        else:
+            compressors.append(('.zst', lambda f: zstandard.ZstdCompressor(level=ZSTD_LEVEL, threads=-1)
+                                .stream_writer(f, closefd=False)))
 
-    if text != '[]':
-        Path(JSON_FILENAME).write_text(text, encoding='utf-8')
-        print(f'已生成 {JSON_FILENAME}，共有词条 {len(integral)} 个')
-    else:
-        print(f'{JSON_FILENAME} 为空，不生成文件。')
+    for filename in (JSON_FILENAME, MINI_JSON_FILENAME, DEDUP_JSON_FILENAME, DIFF_JSON_FILENAME):
+        if not Path(filename).exists():
+            continue
+        for suffix, open_compressor in compressors:
+            with metrics.stage('compress'):
+                with open(filename, 'rb') as src, open(filename + suffix, 'wb') as raw:
+                    with open_compressor(raw) as dst:
+                        shutil.copyfileobj(src, dst, EXPORT_BUFFER_SIZE)
+            size = Path(filename + suffix).stat().st_size
+            metrics.add('compress', bytes=size)
+            print(f"{filename + suffix} 生成完毕 ({Path(filename).stat().st_size} -> {size} 字节)。")
+
+
+def write_run_metrics(report, keep_cache=True):
+    """写出 run_metrics.json，并在缓存目录保留一份供下次运行估计各模组的耗时。"""
+    text = json.dumps(report, ensure_ascii=False, indent=4)
+    Path(RUN_METRICS_FILENAME).write_text(text, encoding='utf-8')
+    if keep_cache:
+        RUN_METRICS_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        RUN_METRICS_CACHE_FILE.write_text(text, encoding='utf-8')
+    print(f"{RUN_METRICS_FILENAME} 生成完毕。")
+
+# 运行统计表中展示的阶段及其中文名称，按执行顺序排列
+METRIC_STAGE_LABELS = {
+    'upstream_db': '下载上游数据库',
+    'download': '下载语言文件',
+    'parse': '解析语言文件',
+    'merge': '合并到数据库',
+    'release_files': '生成 Release 文件',
+    'lookup_index': '重建查询索引',
+    'dedup_json': '生成去重版词典',
+    'diff_json': '生成 diff.json',
+    'compress': '生成压缩文件',
+}
+SLOWEST_REPO_COUNT = 10
+
+
+def format_mib(size):
+    return f"{size / (1024 * 1024):.1f}"
+
+
+def generate_metrics_section(report):
+    """根据 run_metrics.json 的内容生成运行统计表，以及耗时最长的模组列表。"""
+    body = ["\n### 运行统计\n"]
+    http = report['http']
+    body.append(f"总耗时 {report['wall_seconds']:.1f} 秒，主进程峰值内存 {report['peak_rss_mb']:.0f} MiB；"
+                f"HTTP 请求 {http['requests']} 次（重试 {http['retries']} 次），"
+                f"共下载 {format_mib(http['bytes_downloaded'])} MiB。\n")
+    body.append("| 阶段 | 耗时 (秒) | 次数 | 行数 | 写入行数 | 数据量 (MiB) | 截至该阶段的进程峰值内存 (MiB) |")
+    body.append("|---|---:|---:|---:|---:|---:|---:|")
+    for name, label in METRIC_STAGE_LABELS.items():
+        stats = report['stages'].get(name)
+        if not stats:
+            continue
+        body.append(f"| {label} | {stats.get('seconds', 0):.2f} | {stats.get('calls', 0)} | "
+                    f"{stats.get('rows', 0)} | {stats.get('rows_written', 0)} | "
+                    f"{format_mib(stats.get('bytes', 0))} | {stats['process_peak_rss_mb']:.0f} |")
+    body.append("\n模组的下载、解析与合并并发进行，以上耗时为各模组耗时之和；"
+                "峰值内存为主进程启动以来的累计最高值（不含解析子进程），并非该阶段自身的用量。")
+
+    repos = sorted(report['repos'].items(), key=lambda item: item[1].get('repo', {}).get('seconds', 0),
+                   reverse=True)[:SLOWEST_REPO_COUNT]
+    if repos:
+        body.append(f"\n<details><summary>耗时最长的 {len(repos)} 个模组</summary>\n")
+        body.append("| 模组 | 总耗时 (秒) | 下载 (秒) | 解析 (秒) | 合并 (秒) | 下载量 (MiB) | 解析行数 |")
+        body.append("|---|---:|---:|---:|---:|---:|---:|")
+        for repo, stages in repos:
+            def stat(name, counter='seconds'):
+                return stages.get(name, {}).get(counter, 0)
+            body.append(f"| `{repo}` | {stat('repo'):.2f} | {stat('download'):.2f} | {stat('parse'):.2f} | "
+                        f"{stat('merge'):.2f} | {format_mib(stat('download', 'bytes'))} | "
+                        f"{stat('parse', 'rows')} |")
+        body.append("\n</details>")
+    return body
+
+
+def generate_filter_section(report):
+    """列出各导出文件中每个过滤器移除的词条数与数据量。"""
+    body = []
+    for filename, stats in report.get('export_filters', {}).items():
+        body.append(f"\n### {filename}\n")
+        body.append(f"`{filename}` 共有 {stats['entries']} 个词条，与 `{JSON_FILENAME}` 格式相同。"
+                    f"相对数据库中的全部词条，各过滤器依次移除了：\n")
+        body.append("| 过滤条件 | 移除词条 | 减少数据量 (MiB) |")
+        body.append("|---|---:|---:|")
+        for removed in stats['removed'].values():
+            body.append(f"| {removed['label']} | {removed['entries']} | {format_mib(removed['bytes'])} |")
+    return body
 
-    if mini_text != '{}':
-        Path(MINI_JSON_FILENAME).write_text(mini_text, encoding='utf-8')
-        print(f'已生成 {MINI_JSON_FILENAME}，共有词条 {len(integral_mini_final)} 个')
-    else:
-        print(f'{MINI_JSON_FILENAME} 为空，不生成文件。')
 
 # --- 生成 Release Body 的 Markdown 文本 ---
-def generate_release_body(summaries, diff_count):
+def generate_release_body(summaries, diff_count, metrics_report=None, cache_hits=0, cache_fetches=0):
     body = []
     body.append("## 自动词典数据更新")
     body.append(f"本次运行共计处理了 **{diff_count}** 个新增或更新的词条。")
@@ -441,69 +2336,133 @@ def generate_release_body(summaries, diff_count):
         return "\n".join(body)
 
     # 表头
-    body.append("| 模组仓库 | 分支 | 新增条目 | 更新条目 | 状态 |")
-    body.append("|---|---|---:|---:|:---|")
+    body.append("| 模组仓库 | 分支 | 新增条目 | 更新条目 | 未变条目 | 源中已移除 | 状态 |")
+    body.append("|---|---|---:|---:|---:|---:|:---|")
     
     # 表格内容
     for s in summaries:
         status = "✅ 成功" if not s.get('error') else f"❌ 失败: `{s['error']}`"
-        row = f"| `{s['repo']}` | `{s['branch']}` | {s['inserted']} | {s['updated']} | {status} |"
+        row = (f"| `{s['repo']}` | `{s['branch']}` | {s['inserted']} | {s['updated']} | "
+               f"{s['unchanged']} | {s['removed']} | {status} |")
         body.append(row)
         
+    body.append(f"\n抓取缓存：{cache_hits} 个分支的提交未变化，直接复用上次解析结果；"
+                f"{cache_fetches} 个分支重新下载。")
+
     body.append("\n`diff.json` 文件包含了本次运行所有新增和更新的条目详情。")
+    if metrics_report:
+        body.extend(generate_filter_section(metrics_report))
+        body.extend(generate_metrics_section(metrics_report))
     return "\n".join(body)
 
-async def main():
-    if not get_latest_release_db():
-        conn = sqlite3.connect(DB_FILENAME)
-        initialize_db(conn)
-    else:
-        conn = sqlite3.connect(DB_FILENAME)
-    
-    cursor = conn.cursor()
-    
-    run_summaries = []
-    diff_entries = [] # 存储所有变动的条目
-
-    with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-        config = yaml.safe_load(f)
-
-    async with aiohttp.ClientSession() as session:
-        tasks = []
-        for mod_config in config.get('mods', []):
-            # --- 新增功能：支持 branches 列表配置 ---
-            if 'branches' in mod_config and isinstance(mod_config['branches'], list):
-                branches = mod_config['branches']
-                for branch in branches:
-                    # 创建副本以避免配置污染
-                    sub_config = mod_config.copy()
-                    sub_config['branch'] = branch
-                    # 移除列表键，清理配置
-                    del sub_config['branches']
-                    # 注意：如果 root 配置中强行指定了 version，会覆盖自动推断。
-                    # 通常在使用 branches 列表时不应在 root 指定 version。
-                    tasks.append(process_repo(session, sub_config, cursor, diff_entries))
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="从模组仓库拉取翻译，合并到上游词典并生成 Release 文件")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--shard", type=parse_shard, metavar="i/N",
+                       help="只处理第 i 个分片（共 N 个）的模组，结果写入 "
+                            f"{SHARD_FILENAME.format(index='i', count='N')}，不生成 Release 文件；"
+                            "各分片应使用同一份配置与运行统计缓存")
+    group.add_argument("--merge-shards", nargs='+', metavar="SHARD_DB",
+                       help="合并全部分片的结果并生成 Release 文件")
+    return parser.parse_args(argv)
+
+
+async def process_mods(client, mod_configs, write_queue, diff_writer, fetch_cache, parse_executor,
+                       shard_results=None):
+    """规划并处理模组，返回 [(模组位置, 摘要)]，按配置顺序排列。分片运行时只处理分给本分片的模组。"""
+    plans, invalid_summaries = plan_mods(mod_configs, load_cost_estimates())
+    if shard_results is not None:
+        assigned = shard_plans(plans, shard_results.shard_index, shard_results.shard_count)
+        shard_results.record_plan(plans, assigned)
+        plans = assigned
+        # 无效配置的摘要只由第一个分片记录，合并后恰好出现一次
+        if shard_results.shard_index != 1:
+            invalid_summaries = []
+        print(f"分片 {shard_results.shard_index}/{shard_results.shard_count}：处理 {len(plans)} 个模组，"
+              f"预计耗时 {sum(plan.cost for plan in plans):.0f} 秒。")
+
+    async def run_plan(plan, fetch_slot):
+        mod_config = plan.config
+        # --- 新增功能：支持 branches 列表配置 ---
+        if 'branches' in mod_config:
+            # 多分支模式：一次处理所有分支，语言文件按内容去重，各版本在一个事务中合并
+            return await process_mod_branches(client, mod_config, write_queue, diff_writer, fetch_cache,
+                                              parse_executor, fetch_slot)
+        # 原有的单分支模式
+        return await process_repo(client, mod_config, write_queue, diff_writer, fetch_cache, parse_executor,
+                                  fetch_slot)
+
+    results = await run_mod_plans(plans, run_plan)
+    summaries = invalid_summaries + [(plan.index, summary) for plan, plan_summaries in results
+                                     for summary in plan_summaries]
+    return sorted(summaries, key=itemgetter(0))
+
+
+async def main(args=None):
+    args = args or parse_args([])
+    metrics.reset()
+    fetch_cache = FetchCache()
+
+    config_text = Path(CONFIG_FILE).read_text(encoding='utf-8')
+    config = yaml.safe_load(config_text)
+    config_digest = hashlib.sha256(config_text.encode('utf-8')).hexdigest()
+    # 先检查分片文件，避免下载完成后才发现无法合并
+    shards = load_shards(args.merge_shards) if args.merge_shards else None
+    shard_results = None
+    if args.shard:
+        shard_results = ShardResults(SHARD_FILENAME.format(index=args.shard[0], count=args.shard[1]),
+                                     *args.shard, config_digest)
+
+    ndjson_path = DIFF_NDJSON_FILENAME if 'ndjson' in RELEASE_EXTRA_FORMATS else None
+    with create_parse_executor() as parse_executor, DiffWriter(ndjson_path=ndjson_path) as diff_writer:
+        async with HttpClient.create_session() as session:
+            client = HttpClient(session)
+            # 上游数据库的下载与各模组的下载、解析同时进行
+            db_ready = asyncio.create_task(prepare_database(client))
+            write_queue = asyncio.Queue()
+            writer = asyncio.create_task(run_db_writer(db_ready, write_queue, shard_results))
+            if shards:
+                run_summaries = await replay_shards(shards, write_queue, diff_writer)
+                indexed_summaries = None
             else:
-                # 原有的单分支模式
-                tasks.append(process_repo(session, mod_config, cursor, diff_entries))
-        
-        run_summaries = await asyncio.gather(*tasks)
+                indexed_summaries = await process_mods(client, config.get('mods', []), write_queue, diff_writer,
+                                                       fetch_cache, parse_executor, shard_results)
+                run_summaries = [summary for _, summary in indexed_summaries]
+            await write_queue.put(None)
+            await writer
+            conn, base_fingerprint = await db_ready
 
-    conn.commit()
     conn.close()
+    if not shards:
+        fetch_cache.save()
+        metrics.record_fetch_cache(fetch_cache.hits, fetch_cache.fetches)
+        print(f"抓取缓存：命中 {fetch_cache.hits} 个，重新下载 {fetch_cache.fetches} 个。")
+
+    if shard_results is not None:
+        # 分片只输出部分结果，Release 文件由合并阶段生成
+        metrics_report = metrics.report(client)
+        # 分片的统计只含部分模组，不覆盖缓存；合并阶段会并入全部分片的统计后再写入缓存
+        write_run_metrics(metrics_report, keep_cache=False)
+        shard_results.finish(indexed_summaries, metrics_report)
+        print(f"分片结果已写入 {shard_results.path}。")
+        return
 
     # 从更新后的数据库重新生成主要文件
-    regenerate_release_files()
-    
-    # 生成 diff.json
-    print(f"\n正在生成 {DIFF_JSON_FILENAME}，包含 {len(diff_entries)} 个变动条目...")
-    with open(DIFF_JSON_FILENAME, 'w', encoding='utf-8') as f:
-        json.dump(diff_entries, f, ensure_ascii=False, indent=4)
-    print(f"{DIFF_JSON_FILENAME} 生成完毕。")
+    with metrics.stage('release_files'):
+        regenerate_release_files(base_fingerprint, dedup='dedup' in RELEASE_EXTRA_FORMATS)
+
+    # diff.json 已在各模组合并后逐步写出；按需生成压缩版本
+    compress_release_files(RELEASE_EXTRA_FORMATS)
+
+    metrics_report = metrics.report(client)
+    write_run_metrics(metrics_report)
 
     # 生成 Release Body 文件
     print(f"正在生成 {RELEASE_BODY_FILENAME}...")
-    release_body_content = generate_release_body(run_summaries, len(diff_entries))
+    # 分片合并时，抓取缓存的统计来自各分片的运行统计
+    release_body_content = generate_release_body(run_summaries, diff_writer.count, metrics_report,
+                                                 cache_hits=metrics_report['fetch_cache']['hits'],
+                                                 cache_fetches=metrics_report['fetch_cache']['fetches'])
     Path(RELEASE_BODY_FILENAME).write_text(release_body_content, encoding='utf-8')
     print(f"{RELEASE_BODY_FILENAME} 生成完毕。")
 
@@ -516,4 +2475,4 @@ async def main():
     print(f"\n所有任务完成！将在仓库 {GITHUB_REPO} 上创建 Release。")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(main(parse_args()))